@@ -1,12 +1,16 @@
 import os
 import json
 import fitz  # PyMuPDF
+import numpy as np
 from tqdm import tqdm
 from datetime import datetime
 import logging
 import re
+import string
+import functools
+import multiprocessing
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Set, Tuple, BinaryIO, Iterator
 
 # --- Setup Logging ---
 # Mengatur sistem logging untuk mencatat informasi, peringatan, dan kesalahan.
@@ -19,6 +23,62 @@ logger = logging.getLogger(__name__)
 # untuk penanganan path yang lebih modern dan platform-agnostik.
 INPUT_DIR = Path("data/pdf")
 RAW_TXT_DIR = Path("data/raw")
+# Manifest PDF yang sudah diproses: {stem file teks mentah: "ukuran:mtime_ns" PDF sumber}.
+MANIFEST_PATH = RAW_TXT_DIR / ".manifest.json"
+
+# --- Konfigurasi Ekstraksi ---
+# Halaman dengan teks standar lebih pendek dari ini dianggap hasil scan (hanya gambar).
+SCANNED_PAGE_MAX_CHARS = 20
+
+# Halaman dengan blok sebanyak ini atau lebih diurutkan dengan np.lexsort, bukan key lambda Python.
+NUMPY_BLOCK_SORT_MIN_BLOCKS = 64
+
+# --- Pola Regex Pembersihan ---
+# Dikompilasi sekali saat modul dimuat karena clean_extracted_text dipanggil untuk setiap halaman.
+# Pola normalisasi hanya cocok dengan deretan yang benar-benar berubah (bukan satu '\n' atau satu spasi),
+# sehingga halaman yang sudah rapi tidak memicu ribuan substitusi dan re.sub mengembalikan string yang sama.
+_RE_NEWLINES = re.compile(r'\r[\r\n]*|\n[\r\n]+')
+_RE_SPACES = re.compile(r'\t[ \t]*| [ \t]+')
+# Nomor halaman ("1", "- 2 -", "-- 3 --") dan label halaman ("Page 4") digabung dalam satu alternasi.
+_RE_PAGE_NUMBER = re.compile(r'\s*(?:[-_]?\s*\d+\s*[-_]?|page\s+\d+)\s*', re.IGNORECASE)
+_RE_ROMAN_NUMERAL = re.compile(r'[ivxlc]+\.', re.IGNORECASE)
+# Tabel translate untuk menghapus huruf/angka ASCII; baris tanpa huruf/angka tidak berubah setelah translate.
+_ASCII_ALNUM_DELETE_TABLE = str.maketrans('', '', string.ascii_letters + string.digits)
+
+# --- Pola Regex Nama File ---
+_RE_CLEAN_FN = re.compile(r'[^\w\-.]')
+_RE_MULTI_UNDERSCORE = re.compile(r'_+')
+
+# --- Penanda Halaman ---
+# Template penanda halaman langsung dalam bentuk bytes (ASCII) agar tidak perlu format + encode per halaman.
+# Karena ASCII, panjang bytes-nya sama dengan jumlah karakternya.
+_PAGE_MARKER = b"=== HALAMAN %d ===\n\n"
+_PAGE_SEPARATOR = b"\n\n"
+
+# --- Klasifikasi Baris ---
+# Kode hasil _line_kind untuk setiap baris teks halaman.
+LINE_KEEP = 0
+LINE_SEPARATOR = 1
+LINE_PAGE_NUMBER = 2
+LINE_ROMAN_NUMERAL = 3
+LINE_SYMBOL_NOISE = 4
+
+# --- Konfigurasi Paralelisme ---
+# Jumlah proses worker untuk ekstraksi PDF. Satu core disisakan untuk proses utama.
+# Paralelisme sengaja hanya antar-PDF: PyMuPDF tidak thread-safe dan tidak melepas GIL,
+# sehingga thread per halaman di dalam worker tidak aman dan tidak menambah throughput.
+NUM_WORKERS = max(1, (os.cpu_count() or 1) - 1)
+# Jumlah PDF yang dikirim ke worker sekaligus untuk mengurangi overhead IPC.
+POOL_CHUNKSIZE = 4
+# Ukuran buffer file output teks mentah (1 MB).
+WRITE_BUFFER_SIZE = 1 << 20
+# Persentase cache store MuPDF yang dibuang setelah setiap PDF selesai (100 = kosongkan seluruhnya).
+# Batas atas store tetap default MuPDF (256 MB) per proses worker.
+MUPDF_STORE_SHRINK_PERCENT = 100
+
+# Manifest PDF yang sudah diproses. Diisi sekali per worker melalui
+# initializer Pool agar tidak di-pickle ulang untuk setiap PDF.
+_manifest: Dict[str, str] = {}
 
 # --- Fungsi Utilitas Direktori ---
 
@@ -31,8 +91,70 @@ def ensure_directories():
         directory.mkdir(parents=True, exist_ok=True)
         logger.info(f"Directory ensured: {directory}")
 
+# --- Fungsi Pemindaian Direktori ---
+
+def iter_pdf_files(directory: Path) -> Iterator[Path]:
+    """
+    Menghasilkan path setiap file PDF di direktori secara malas menggunakan os.scandir,
+    tanpa membangun seluruh daftar file terlebih dahulu.
+    """
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_file() and entry.name.lower().endswith(".pdf"):
+                yield Path(entry.path)
+
+def list_raw_text_stems(directory: Path) -> Set[str]:
+    """
+    Mengembalikan set stem (nama tanpa ekstensi) dari file .txt yang sudah ada di direktori.
+    """
+    with os.scandir(directory) as entries:
+        return {entry.name[:-4] for entry in entries if entry.name.endswith(".txt")}
+
+def load_manifest() -> Dict[str, str]:
+    """
+    Memuat manifest PDF yang sudah diproses dari MANIFEST_PATH dengan satu kali json.load.
+    Jika manifest belum ada (atau rusak), manifest dibangun ulang dari file .txt yang sudah ada
+    di RAW_TXT_DIR dengan kunci kosong, yaitu dipercaya tanpa pemeriksaan ukuran/mtime.
+    
+    Returns:
+        Dict[str, str]: Pemetaan stem file teks mentah ke kunci "ukuran:mtime_ns" PDF sumbernya.
+    """
+    try:
+        with open(MANIFEST_PATH, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if isinstance(manifest, list):
+            # Manifest format lama berupa daftar stem; kuncinya belum diketahui.
+            return dict.fromkeys(manifest, "")
+        return {str(stem): str(key) for stem, key in manifest.items()}
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError, TypeError, AttributeError) as e:
+        logger.warning(f"Could not read manifest {MANIFEST_PATH}, rebuilding it from {RAW_TXT_DIR}: {e}")
+    return dict.fromkeys(list_raw_text_stems(RAW_TXT_DIR), "")
+
+def pdf_manifest_key(pdf_file_path: Path) -> str:
+    """
+    Kunci manifest sebuah PDF berupa "ukuran:mtime_ns", sehingga PDF yang diubah akan diekstrak ulang.
+    """
+    st = pdf_file_path.stat()
+    return f"{st.st_size}:{st.st_mtime_ns}"
+
+def save_manifest(manifest: Dict[str, str]):
+    """
+    Menyimpan manifest secara atomik: ditulis ke file sementara lalu di-os.replace ke MANIFEST_PATH,
+    sehingga manifest tidak pernah setengah tertulis jika proses terhenti.
+    """
+    tmp_path = MANIFEST_PATH.with_name(MANIFEST_PATH.name + ".tmp")
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=0, sort_keys=True)
+        os.replace(tmp_path, MANIFEST_PATH)
+    except OSError as e:
+        logger.error(f"Error saving manifest {MANIFEST_PATH}: {e}")
+
 # --- Fungsi Generasi Nama File Teks Mentah ---
 
+@functools.lru_cache(maxsize=65536)
 def generate_raw_text_filename(pdf_filename_stem: str) -> str:
     """
     Menghasilkan nama file teks mentah yang bersih dan unik dari stem nama file PDF.
@@ -43,28 +165,37 @@ def generate_raw_text_filename(pdf_filename_stem: str) -> str:
         
     Returns:
         str: Nama file yang dibersihkan.
+    
+    Fungsi ini murni (hasil hanya bergantung pada input), sehingga hasilnya di-cache.
     """
     # Bersihkan nama file: hapus karakter non-alfanumerik atau non-underscore/dash, 
     # ganti spasi dengan underscore, hindari underscore berturut-turut.
-    clean_name = re.sub(r'[^\w\-.]', '_', pdf_filename_stem.lower())
-    clean_name = re.sub(r'_+', '_', clean_name).strip('_')
+    clean_name = _RE_CLEAN_FN.sub('_', pdf_filename_stem.lower())
+    clean_name = _RE_MULTI_UNDERSCORE.sub('_', clean_name).strip('_')
     return clean_name
 
 # --- Fungsi Ekstraksi Teks PDF ---
 
-def extract_text_blocks_improved(page: fitz.Page) -> str:
+def extract_text_blocks_improved(page: fitz.Page, textpage: fitz.TextPage) -> str:
     """
-    Mengekstrak teks dari halaman PDF menggunakan metode 'blocks' PyMuPDF,
+    Mengekstrak teks dari halaman PDF menggunakan metode 'blocks' PyMuPDF (dibaca dari `textpage`),
     dengan penyortiran yang lebih baik dan filter untuk block yang valid.
     """
     try:
-        blocks = page.get_text("blocks")
+        blocks = page.get_text("blocks", textpage=textpage)
         if not blocks:
             return ""
         
         # Urutkan blok berdasarkan posisi (dari atas ke bawah, dari kiri ke kanan)
         # Menggunakan pembulatan untuk menangani sedikit perbedaan koordinat.
-        blocks.sort(key=lambda b: (round(b[1]), round(b[0])))
+        if len(blocks) >= NUMPY_BLOCK_SORT_MIN_BLOCKS:
+            # Kunci dihitung tervektorisasi; np.rint dan round() sama-sama membulatkan ke genap terdekat,
+            # dan lexsort stabil seperti list.sort, sehingga urutannya identik.
+            coords = np.array([(b[1], b[0]) for b in blocks], dtype=np.float64)
+            order = np.lexsort((np.rint(coords[:, 1]).astype(np.int64), np.rint(coords[:, 0]).astype(np.int64)))
+            blocks = [blocks[i] for i in order]
+        else:
+            blocks.sort(key=lambda b: (round(b[1]), round(b[0])))
         
         text_parts = []
         for block in blocks:
@@ -79,30 +210,23 @@ def extract_text_blocks_improved(page: fitz.Page) -> str:
         logger.debug(f"Block extraction failed on page (improved): {e}")
         return ""
 
-def extract_text_dict_improved(page: fitz.Page) -> str:
+def extract_text_dict_improved(page: fitz.Page, textpage: fitz.TextPage) -> str:
     """
-    Mengekstrak teks dari halaman PDF menggunakan metode 'dict' PyMuPDF,
-    dengan iterasi yang lebih hati-hati melalui struktur kamus.
+    Mengekstrak teks dari halaman PDF (dibaca dari `textpage`) dengan format keluaran metode 'dict'
+    (baris dalam satu blok digabung dengan spasi, blok dipisahkan newline).
+    Karena baris digabung sebelum pembersihan, baris pendek tidak ikut terbuang,
+    sehingga hasilnya sering lebih panjang daripada metode lain.
+    Teks per blok diambil dari metode 'blocks' yang sudah dirangkai MuPDF di C,
+    sehingga tidak perlu iterasi Python melalui blocks -> lines -> spans.
     """
     try:
-        text_dict = page.get_text("dict")
-        if not text_dict or "blocks" not in text_dict:
-            return ""
-        
         page_text_parts = []
-        for block in text_dict.get("blocks", []):
-            if "lines" not in block:
+        for block in page.get_text("blocks", textpage=textpage):
+            # Format block: [x0, y0, x1, y1, text, block_no, block_type]; block_type 0 = teks
+            if block[6] != 0:
                 continue
             
-            block_lines = []
-            for line in block["lines"]:
-                if "spans" not in line:
-                    continue
-                
-                line_text = "".join([span.get("text", "") for span in line["spans"]])
-                if line_text.strip():
-                    block_lines.append(line_text.strip())
-            
+            block_lines = [line.strip() for line in block[4].splitlines() if line.strip()]
             if block_lines:
                 page_text_parts.append(" ".join(block_lines)) # Gabungkan baris dalam blok dengan spasi
         
@@ -111,6 +235,42 @@ def extract_text_dict_improved(page: fitz.Page) -> str:
         logger.debug(f"Dict extraction failed on page (improved): {e}")
         return ""
 
+def _line_kind(line: str) -> int:
+    """
+    Mengklasifikasikan satu baris teks (sudah di-strip dan tidak kosong) dalam satu kali pemeriksaan.
+    Filter dirancang sangat konservatif, hanya menandai baris yang pasti artefak.
+    
+    Args:
+        line (str): Baris teks yang akan diklasifikasikan.
+        
+    Returns:
+        int: Salah satu konstanta LINE_* (LINE_KEEP jika baris dipertahankan).
+    """
+    # Nomor halaman yang sangat jelas. Contoh: "1", "- 2 -", "-- 3 --", "Page 4"
+    if _RE_PAGE_NUMBER.fullmatch(line):
+        return LINE_PAGE_NUMBER
+    
+    line_len = len(line)
+    
+    # Garis horizontal atau deretan simbol sederhana yang berulang. Contoh: "------------", "*********", "========"
+    # Hanya jika baris *seluruhnya* terdiri dari satu atau dua karakter non-alphanumeric berulang.
+    # Gerbang murah: garis pemisah tidak diawali huruf/angka. Himpunan karakter dibangun di level C,
+    # lalu cek isalnum/isspace cukup dilakukan pada (maksimal) dua karakter unik.
+    if line_len > 5 and not line[0].isalnum(): # Harus cukup panjang agar dianggap garis pemisah
+        line_chars = set(line)
+        if len(line_chars) <= 2 and not any(char.isalnum() or char.isspace() for char in line_chars):
+            return LINE_SEPARATOR
+    
+    # Baris sangat pendek tanpa huruf/angka (seringkali sisa-sisa simbol atau numbering yang salah)
+    if line_len <= 3 and line.translate(_ASCII_ALNUM_DELETE_TABLE) == line:
+        return LINE_SYMBOL_NOISE
+    
+    # Roman numerals yang tampak sebagai penomoran list/sub-bagian berdiri sendiri. Contoh: "I.", "II.", "V."
+    if line_len <= 5 and _RE_ROMAN_NUMERAL.fullmatch(line):
+        return LINE_ROMAN_NUMERAL
+    
+    return LINE_KEEP
+
 def clean_extracted_text(text: str) -> str:
     """
     Membersihkan teks yang diekstrak dari PDF.
@@ -128,8 +288,8 @@ def clean_extracted_text(text: str) -> str:
     
     # 1. Normalisasi spasi dan baris baru
     text = text.replace('\x00', ' ').replace('\xa0', ' ') # Hapus karakter null dan non-breaking space
-    text = re.sub(r'[\r\n]+', '\n', text) # Normalisasi CRLF ke LF, hapus multiple newlines menjadi single newline
-    text = re.sub(r'[ \t]+', ' ', text) # Normalisasi spasi dan tab ganda menjadi single space
+    text = _RE_NEWLINES.sub('\n', text) # Normalisasi CRLF ke LF, hapus multiple newlines menjadi single newline
+    text = _RE_SPACES.sub(' ', text) # Normalisasi spasi dan tab ganda menjadi single space
     text = text.strip() # Hapus spasi/newline di awal/akhir setelah normalisasi
 
     if not text: # Jika teks menjadi kosong setelah normalisasi awal
@@ -144,93 +304,118 @@ def clean_extracted_text(text: str) -> str:
             continue
         
         # 2. Filter baris yang tidak diinginkan (artefak yang sangat spesifik dan jelas)
-        # Filter ini dirancang untuk sangat konservatif, hanya membuang yang pasti artefak.
-        
-        # Filter nomor halaman yang sangat jelas:
-        # Contoh: "1", "- 2 -", "-- 3 --", "Page 4"
-        if re.fullmatch(r'^\s*[-_]?\s*\d+\s*[-_]?\s*$', line, re.IGNORECASE) or \
-           re.fullmatch(r'^\s*[Pp][Aa][Gg][Ee]\s+\d+\s*$', line, re.IGNORECASE):
+        if _line_kind(line) != LINE_KEEP:
             continue
         
-        # Filter garis horizontal atau deretan simbol sederhana yang berulang:
-        # Contoh: "------------", "*********", "========"
-        # Hanya filter jika baris *seluruhnya* terdiri dari satu atau dua karakter non-alphanumeric berulang.
-        if len(line) > 5: # Harus cukup panjang agar dianggap garis pemisah
-            if all(not char.isalnum() and not char.isspace() for char in line):
-                if len(set(char for char in line if not char.isspace())) <= 2:
-                    continue
+        cleaned_lines.append(line)
+    
+    # Gabungkan baris yang bersih dengan satu newline.
+    return "\n".join(cleaned_lines).strip()
+
 
-        # Filter baris yang sangat pendek dan tidak mengandung huruf/angka (seringkali sisa-sisa simbol atau numbering yang salah)
-        if len(line) <= 3 and not re.search(r'[a-zA-Z0-9]', line):
+def extract_best_page_text(page: fitz.Page, page_label: str) -> str:
+    """
+    Mengekstrak teks satu halaman PDF dengan berbagai metode PyMuPDF dan
+    mengembalikan hasil terbaik (paling panjang) setelah pembersihan.
+    
+    Args:
+        page (fitz.Page): Halaman PDF.
+        page_label (str): Label halaman untuk pesan log (misal: "page 3 of x.pdf").
+        
+    Returns:
+        str: Teks halaman yang sudah dibersihkan, atau string kosong jika tidak ada teks.
+    """
+    page_text_candidates = {}
+    
+    # Analisis layout (TextPage) dibangun sekali per halaman lalu dipakai ulang oleh semua metode.
+    # Flag-nya sama dengan yang dipakai page.get_text("text"/"blocks"), dan teks tetap dibaca melalui
+    # page.get_text(textpage=...) karena sort=True di sana merangkai ulang baris (get_sorted_text),
+    # berbeda dengan TextPage.extractText(sort=True).
+    textpage = page.get_textpage(flags=fitz.TEXTFLAGS_TEXT)
+    
+    # Urutan metode menentukan pemenang jika panjang teks sama (yang lebih dulu menang).
+    # Semua metode dicoba: teks standard_sorted bisa saja panjang tetapi bercampur watermark,
+    # sehingga panjang satu kandidat saja tidak cukup untuk menghentikan pencarian.
+    methods = [
+        ("standard_sorted", lambda p, tp: p.get_text("text", sort=True, textpage=tp)),
+        ("standard_unsorted", lambda p, tp: p.get_text("text", textpage=tp)),
+        ("blocks_custom", extract_text_blocks_improved),
+        ("dict_custom", extract_text_dict_improved)
+    ]
+    
+    for method_name, method_func in methods:
+        # blocks_custom berisi baris yang sama dengan standard_unsorted dalam urutan lain, sehingga panjangnya
+        # setelah dibersihkan sama dan tidak pernah menang; hanya dipakai sebagai cadangan jika standard_unsorted kosong.
+        if method_name == "blocks_custom" and "standard_unsorted" in page_text_candidates:
             continue
         
-        # Filter Roman numerals jika tampak sebagai penomoran list/sub-bagian yang berdiri sendiri.
-        # Contoh: "I.", "II.", "V."
-        if len(line) <= 5 and re.fullmatch(r'^[ivxlc]+\.$', line, re.IGNORECASE):
+        try:
+            result = method_func(page, textpage) or ""
+        except Exception as e:
+            logger.debug(f"Method '{method_name}' failed on {page_label}: {e}")
             continue
         
-        cleaned_lines.append(line)
+        cleaned_current_text = clean_extracted_text(result)
+        if cleaned_current_text:
+            page_text_candidates[method_name] = cleaned_current_text
+        
+        # Halaman hasil scan (hanya gambar) hampir tidak memiliki lapisan teks; metode lain tidak akan membantu.
+        if method_name == "standard_sorted" and len(result.strip()) < SCANNED_PAGE_MAX_CHARS:
+            logger.debug(f"{page_label} looks image-only, skipping other methods.")
+            break
     
-    # Gabungkan baris yang bersih dengan satu newline.
-    return "\n".join(cleaned_lines).strip()
-
+    textpage = None # Lepaskan struktur TextPage MuPDF sebelum halaman berikutnya
+    
+    # Pilih teks terbaik: yang paling panjang (kandidat sudah dibersihkan); max() memilih yang pertama jika sama
+    best_method, best_page_text = max(page_text_candidates.items(), key=lambda item: len(item[1]), default=(None, ""))
+    if best_method:
+        logger.debug(f"{page_label}: Using {best_method} method (length {len(best_page_text)})")
+    return best_page_text
 
-def extract_text_from_pdf(file_path: Path) -> Optional[str]:
+def extract_text_from_pdf(file_path: Path, out_fh: BinaryIO) -> Optional[int]:
     """
     Mengekstrak teks dari file PDF menggunakan berbagai metode PyMuPDF 
     dan memilih hasil terbaik setelah pembersihan.
+    Teks setiap halaman langsung ditulis ke `out_fh` begitu selesai diproses,
+    sehingga seluruh dokumen tidak pernah ditampung di memori sekaligus.
     
     Args:
         file_path (Path): Path ke file PDF.
+        out_fh (BinaryIO): File handle biner yang sudah terbuka untuk ditulisi; teks ditulis sebagai UTF-8.
         
     Returns:
-        Optional[str]: Seluruh teks yang diekstrak dari PDF, atau None jika gagal.
+        Optional[int]: Jumlah karakter yang ditulis ke `out_fh`, atau None jika gagal.
     """
     try:
         doc = fitz.open(file_path)
-        full_text_parts = []
+        chars_written = 0
         
-        for page_num in range(len(doc)):
-            try:
-                page = doc[page_num]
-                page_text_candidates = {}
-                
-                # Coba berbagai metode ekstraksi dan simpan hasilnya
-                methods = {
-                    "standard_sorted": lambda p: p.get_text("text", sort=True),
-                    "standard_unsorted": lambda p: p.get_text("text"),
-                    "blocks_custom": extract_text_blocks_improved,
-                    "dict_custom": extract_text_dict_improved
-                }
-                
-                for method_name, method_func in methods.items():
-                    try:
-                        result = method_func(page)
-                        if result and result.strip():
-                            page_text_candidates[method_name] = result
-                    except Exception as e:
-                        logger.debug(f"Method '{method_name}' failed on page {page_num + 1} of {file_path.name}: {e}")
-                
-                best_page_text = ""
-                # Pilih teks terbaik: yang paling panjang (setelah dibersihkan)
-                for method_name, text in page_text_candidates.items():
-                    cleaned_current_text = clean_extracted_text(text)
-                    if len(cleaned_current_text) > len(best_page_text):
-                        best_page_text = cleaned_current_text
-                        logger.debug(f"Page {page_num + 1}: Using {method_name} method (length {len(best_page_text)})")
+        try:
+            for page_num, page in enumerate(doc, start=1):
+                page_label = f"page {page_num} of {file_path.name}"
+                try:
+                    best_page_text = extract_best_page_text(page, page_label)
+                except Exception as e:
+                    logger.error(f"Error processing {page_label}: {e}", exc_info=True)
+                    continue
                 
                 if best_page_text:
-                    full_text_parts.append(f"\n=== HALAMAN {page_num + 1} ===\n") # Penanda halaman
-                    full_text_parts.append(best_page_text)
+                    # Penanda halaman; halaman berikutnya dipisahkan dengan satu baris kosong.
+                    # Error penulisan tidak ditangkap per halaman agar PDF dilaporkan gagal, bukan terpotong.
+                    marker = _PAGE_MARKER % page_num
+                    if chars_written:
+                        marker = _PAGE_SEPARATOR + marker
+                    out_fh.write(marker)
+                    out_fh.write(best_page_text.encode("utf-8"))
+                    chars_written += len(marker) + len(best_page_text)
                 else:
-                    logger.warning(f"No meaningful text extracted from page {page_num + 1} of {file_path.name}")
-                    
-            except Exception as e:
-                logger.error(f"Error processing page {page_num + 1} of {file_path.name}: {e}", exc_info=True)
-                continue 
+                    logger.warning(f"No meaningful text extracted from {page_label}")
+        finally:
+            doc.close()
+            # Kosongkan cache store MuPDF agar memori tidak terus menumpuk antar-PDF di worker yang sama.
+            fitz.TOOLS.store_shrink(MUPDF_STORE_SHRINK_PERCENT)
         
-        doc.close()
-        return "\n".join(full_text_parts).strip()
+        return chars_written
         
     except fitz.FileDataError as e:
         logger.error(f"PDF file corrupted or invalid: {file_path}: {e}")
@@ -239,19 +424,71 @@ def extract_text_from_pdf(file_path: Path) -> Optional[str]:
         logger.error(f"Error opening or processing PDF {file_path}: {e}", exc_info=True)
         return None
 
-# --- Fungsi Penyimpanan File ---
+# --- Fungsi Worker Pemrosesan ---
 
-def save_text_file(content: str, file_path: Path) -> bool:
+def _init_worker(manifest: Dict[str, str]):
+    """
+    Initializer untuk setiap proses worker Pool. Menyimpan manifest ke variabel global modul
+    dan mengosongkan cache MuPDF worker.
     """
-    Menyimpan konten teks ke file yang ditentukan.
+    global _manifest
+    _manifest = manifest
+    # Mulai setiap worker dengan cache store MuPDF yang kosong.
+    fitz.TOOLS.store_shrink(MUPDF_STORE_SHRINK_PERCENT)
+
+def process_one_pdf(pdf_file_path: Path) -> Tuple[str, str, str, str]:
     """
+    Memproses satu file PDF: mengekstrak teks, memvalidasi panjangnya, lalu
+    menyimpannya ke RAW_TXT_DIR. Fungsi ini dijalankan di dalam proses worker.
+    
+    Args:
+        pdf_file_path (Path): Path ke file PDF.
+        
+    Returns:
+        Tuple[str, str, str, str]: (status, nama file, stem file teks mentah, kunci manifest),
+                         dengan status salah satu dari "processed", "skipped", atau "failed".
+    """
+    filename = pdf_file_path.name
+    file_stem = ""
+    manifest_key = ""
     try:
-        with open(file_path, "w", encoding="utf-8") as f:
-            f.write(content)
-        return True
+        file_stem = generate_raw_text_filename(pdf_file_path.stem) # Nama file .txt yang akan disimpan
+        manifest_key = pdf_manifest_key(pdf_file_path)
+        txt_filename_path = RAW_TXT_DIR / f"{file_stem}.txt"
+        
+        # Lewati jika PDF tercatat di manifest dengan ukuran/mtime yang sama (atau entri lama tanpa kunci)
+        # dan file .txt-nya masih ada. Keberadaan file hanya diperiksa untuk stem yang akan dilewati.
+        if _manifest.get(file_stem) in (manifest_key, "") and txt_filename_path.exists():
+            logger.info(f"File {filename} (raw text stem: {file_stem}) already has a corresponding raw text file, skipping.")
+            return "skipped", filename, file_stem, manifest_key
+        
+        logger.info(f"Processing: {filename}")
+        
+        # Ekstrak teks dari PDF dan tulis langsung per halaman ke file .txt di RAW_TXT_DIR
+        try:
+            # Mode biner melewati lapisan TextIOWrapper; buffer besar menggabungkan write per halaman.
+            with open(txt_filename_path, "wb", buffering=WRITE_BUFFER_SIZE) as out_fh:
+                chars_written = extract_text_from_pdf(pdf_file_path, out_fh)
+        except OSError as e:
+            logger.error(f"Error writing text file {txt_filename_path}: {e}")
+            chars_written = None
+        
+        # Periksa apakah ekstraksi berhasil dan teks cukup panjang.
+        if not chars_written or chars_written < 200: # Batas minimal 200 karakter
+            logger.error(f"Failed to extract sufficient text from {filename} or text too short.")
+            # Hapus file parsial agar tidak dianggap sudah diproses pada run berikutnya.
+            try:
+                os.unlink(txt_filename_path)
+            except FileNotFoundError:
+                pass
+            return "failed", filename, file_stem, manifest_key
+        
+        logger.info(f"Successfully processed {filename} -> {txt_filename_path.name}")
+        return "processed", filename, file_stem, manifest_key
+        
     except Exception as e:
-        logger.error(f"Error saving text file {file_path}: {e}")
-        return False
+        logger.error(f"Error processing {filename}: {e}", exc_info=True) # exc_info=True untuk traceback
+        return "failed", filename, file_stem, manifest_key
 
 # --- Fungsi Utama Pemrosesan ---
 
@@ -259,6 +496,7 @@ def main():
     """
     Fungsi utama untuk mengekstrak teks dari semua file PDF di INPUT_DIR,
     membersihkannya, dan menyimpan ke file teks mentah di data/raw/.
+    Setiap PDF diproses secara paralel oleh Pool proses worker.
     """
     try:
         # Langkah 1: Pastikan semua direktori yang diperlukan ada.
@@ -270,66 +508,53 @@ def main():
             print(f"Silakan buat folder '{INPUT_DIR}' dan masukkan file PDF di dalamnya.")
             return
         
-        # Langkah 3: Dapatkan daftar semua file PDF di direktori input.
-        pdf_files = list(INPUT_DIR.glob("*.pdf"))
-        
-        if not pdf_files:
-            logger.warning(f"No PDF files found in {INPUT_DIR}")
-            print(f"Tidak ada file PDF di folder '{INPUT_DIR}'")
-            return
-        
-        logger.info(f"Found {len(pdf_files)} PDF files to process.")
-        print(f"� Ditemukan {len(pdf_files)} file PDF untuk diproses.")
-        
-        # Mengumpulkan daftar file teks mentah yang sudah ada untuk menghindari pemrosesan ulang.
-        existing_raw_txt_files = {f.stem for f in RAW_TXT_DIR.glob("*.txt")}
-        logger.info(f"Found {len(existing_raw_txt_files)} existing raw text files in {RAW_TXT_DIR}.")
+        # Memuat manifest PDF yang sudah diproses untuk menghindari pemrosesan ulang.
+        # File .txt tanpa entri manifest (misalnya sisa run yang terhenti) akan ditulis ulang.
+        manifest_changed = not MANIFEST_PATH.exists()
+        manifest = load_manifest()
+        logger.info(f"Found {len(manifest)} already processed PDFs in manifest {MANIFEST_PATH}.")
 
         # Variabel untuk melacak status pemrosesan
         processed_count = 0
         failed_count = 0
         skipped_count = 0
         
-        # Langkah 4: Iterasi (ulang) melalui setiap file PDF.
-        for pdf_file_path in tqdm(pdf_files, desc="Memproses PDF"):
-            try:
-                filename = pdf_file_path.name
-                file_stem = generate_raw_text_filename(pdf_file_path.stem) # Nama file .txt yang akan disimpan
-                
-                # Cek apakah file ini sudah diproses ke raw .txt sebelumnya
-                if file_stem in existing_raw_txt_files:
-                    logger.info(f"File {filename} (raw text stem: {file_stem}) already has a corresponding raw text file, skipping.")
-                    skipped_count += 1
-                    continue
-                
-                logger.info(f"Processing: {filename}")
-                
-                # Ekstrak teks dari PDF
-                full_text = extract_text_from_pdf(pdf_file_path)
-                
-                # Periksa apakah ekstraksi berhasil dan teks cukup panjang.
-                if not full_text or len(full_text.strip()) < 200: # Batas minimal 200 karakter
-                    logger.error(f"Failed to extract sufficient text from {filename} or text too short.")
-                    failed_count += 1
-                    continue
-                
-                # Simpan teks mentah ke file .txt di direktori RAW_TXT_DIR
-                txt_filename_path = RAW_TXT_DIR / f"{file_stem}.txt"
-                if not save_text_file(full_text, txt_filename_path):
-                    failed_count += 1
-                    continue # Lanjutkan ke file berikutnya jika gagal menyimpan
-                
-                processed_count += 1
-                logger.info(f"Successfully processed {filename} -> {txt_filename_path.name}")
-                
-            except Exception as e:
-                logger.error(f"Error processing {filename}: {e}", exc_info=True) # exc_info=True untuk traceback
-                failed_count += 1
-                continue
+        # Langkah 3 & 4: Enumerasi file PDF secara malas dan proses setiap file secara paralel.
+        # Ekstraksi dimulai sebelum seluruh direktori selesai dibaca; imap_unordered dipakai
+        # agar PDF yang cepat selesai tidak menunggu PDF yang lambat.
+        logger.info(f"Using {NUM_WORKERS} worker processes.")
+        try:
+            with multiprocessing.Pool(processes=NUM_WORKERS,
+                                      initializer=_init_worker,
+                                      initargs=(manifest,)) as pool:
+                results = pool.imap_unordered(process_one_pdf, iter_pdf_files(INPUT_DIR), chunksize=POOL_CHUNKSIZE)
+                for status, filename, file_stem, manifest_key in tqdm(results, desc="Memproses PDF"):
+                    if status == "processed":
+                        processed_count += 1
+                        manifest[file_stem] = manifest_key
+                    elif status == "skipped":
+                        skipped_count += 1
+                        # Entri lama tanpa kunci dilengkapi dengan ukuran/mtime PDF saat ini.
+                        if manifest.get(file_stem) != manifest_key:
+                            manifest[file_stem] = manifest_key
+                            manifest_changed = True
+                    else:
+                        failed_count += 1
+        finally:
+            # Manifest ditulis sekali di akhir (juga saat terhenti), hanya jika isinya berubah.
+            if processed_count or manifest_changed:
+                save_manifest(manifest)
+        
+        total_pdf_files = processed_count + failed_count + skipped_count
+        if not total_pdf_files:
+            logger.warning(f"No PDF files found in {INPUT_DIR}")
+            print(f"Tidak ada file PDF di folder '{INPUT_DIR}'")
+            return
+        logger.info(f"Found {total_pdf_files} PDF files.")
         
         # Langkah 5: Tampilkan ringkasan pemrosesan.
         print(f"\n=== RINGKASAN PEMROSESAN ===")
-        print(f"Total file PDF ditemukan: {len(pdf_files)}")
+        print(f"Total file PDF ditemukan: {total_pdf_files}")
         print(f"Berhasil dikonversi ke teks: {processed_count}")
         print(f"Gagal dikonversi: {failed_count}")
         print(f"Dilewati (sudah ada raw text-nya): {skipped_count}")
@@ -1,16 +1,100 @@
 import os
 import re
 import json
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from typing import Dict, List, Tuple, Optional
 import logging
 from datetime import datetime
 
+# Mesin regex opsional: modul pihak ketiga `regex` lebih cepat untuk pola pendek berawalan literal
+# (nomor perkara, pasal, umur, jenis kelamin, pekerjaan). Jika tidak terpasang, gunakan `re` bawaan.
+try:
+    import regex as fast_re
+except ImportError:
+    fast_re = re
+
+# pandas + pyarrow (opsional) untuk menulis cache parquet ringkas yang dibaca 03_retrieval.py dan 04_predict.py
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
 # Konfigurasi path
 RAW_DIR = Path("data/raw")
 OUTPUT_FILE = Path("data/processed/cases.json")
+CASE_PARQUET_FILE = Path("data/processed/cases.parquet")
+# Hanya kolom yang dipakai tahap retrieval dan prediksi yang disimpan ke parquet
+CASE_PARQUET_COLUMNS = ["case_id", "pasal", "ringkasan_fakta", "jenis_perkara", "status_hukuman", "no_perkara", "tanggal"]
 LOG_FILE = Path("data/logs/extraction.log")
 
+# Konfigurasi paralelisme: jumlah file yang dikirim ke satu worker sekaligus untuk mengurangi overhead IPC
+POOL_CHUNKSIZE = 8
+
+# Pola regex yang dipakai berulang di setiap dokumen, dikompilasi sekali saat modul dimuat
+# Pola normalisasi clean_text hanya cocok dengan bagian yang benar-benar berubah (bukan satu '\n',
+# satu spasi, atau kurung tanpa spasi), sehingga teks yang sudah rapi tidak memicu substitusi per karakter.
+_RE_CRLF = re.compile(r'\r[\r\n]*|\n[\r\n]+')
+_RE_WS = re.compile(r'\t[ \t]*| [ \t]+')
+_RE_OPENPAREN = re.compile(r'\s+\(\s*|\(\s+')
+_RE_CLOSEPAREN = re.compile(r'\s+\)\s*|\)\s+')
+_RE_WS_RUN = re.compile(r'\s+')
+_RE_AYAT = re.compile(r'Ayat\s*\(\s*(\d+)\s*\)', re.IGNORECASE)
+_RE_HURUF = re.compile(r'huruf\s*([a-zA-Z])', re.IGNORECASE)
+_RE_SPLIT_JO = re.compile(r'\s+(?:jo|dan)\s+', re.IGNORECASE)
+_RE_PASAL_CHECK = re.compile(r'Pasal\s+\d+', re.IGNORECASE)
+_RE_FACT_HEADER = re.compile(
+    r'^(?:PUTUSAN\s+NOMOR\s+[\s\S]*?DENGAN\s+RAHMAT\s+TUHAN\s+YANG\s+MAHA\s+ESA|PENGADILAN\s+NEGERI.*?\n+)*',
+    re.IGNORECASE | re.DOTALL
+)
+_RE_FACT_HEADER_AGGRESSIVE = re.compile(
+    r'^(.*?PUTUSAN\s+NOMOR\s+[\s\S]*?(?:DENGAN\s+RAHMAT\s+TUHAN\s+YANG\s+MAHA\s+ESA|MAJELIS\s+HAKIM|MENIMBANG|MENGADILI)\s*?\n+)?',
+    re.IGNORECASE | re.DOTALL
+)
+_RE_PAGE_NUMBER_LINE = re.compile(r'^\s*[-_]?\s*\d+\s*[-_]?\s*$')
+_RE_SYMBOL_LINE = re.compile(r'^[\s\W_]*$')
+_RE_ALNUM = re.compile(r'[a-zA-Z0-9]')
+# Pola penanda awal dan akhir potensial dari ringkasan fakta, dicoba berurutan (prioritas)
+_RE_FACT_START = (
+    re.compile(r'DUDUK\s+PERKARA', re.IGNORECASE),
+    re.compile(r'I\.\s*PERKARA', re.IGNORECASE),
+    re.compile(r'FAKTA-FAKTA', re.IGNORECASE),
+    re.compile(r'MENIMBANG(?:\s+BAHWA|\,\s+bahwa)?\s+permohonan', re.IGNORECASE),
+    re.compile(r'DALAM\s+POKOK\s+PERKARA', re.IGNORECASE),
+    re.compile(r'TENTANG\s+PERKARA', re.IGNORECASE),
+    re.compile(r'POKOK\s+GUGATAN', re.IGNORECASE), # Untuk perdata/TUN
+    re.compile(r'URAIAN\s+PERBUATAN', re.IGNORECASE), # Untuk pidana
+)
+_RE_FACT_END = (
+    re.compile(r'TENTANG\s+HUKUM', re.IGNORECASE),
+    re.compile(r'MENIMBANG(?:\s+TENTANG|\,\s+tentang)?\s+HUKUM', re.IGNORECASE),
+    re.compile(r'DALAM\s+PERTIMBANGAN\s+HUKUM', re.IGNORECASE),
+    re.compile(r'MEMUTUSKAN', re.IGNORECASE),
+    re.compile(r'MENGADILI', re.IGNORECASE),
+    re.compile(r'AMAR\s+PUTUSAN', re.IGNORECASE),
+    re.compile(r'DALAM\s+EKSEPSI', re.IGNORECASE), # Jika ada eksepsi setelah fakta
+    re.compile(r'Demikian\s+diputus\s+dalam\s+rapat\s+musyawarah', re.IGNORECASE),
+)
+
+# --- Validasi kandidat tanggal putusan ---
+# Tanggal yang dikelilingi kata-kata ini adalah tanggal lahir/dokumen identitas, bukan tanggal putusan
+_DATE_CONTEXT_SKIP_KEYWORDS = ('lahir', 'usia', 'umur', 'ktp', 'identitas', 'akta', 'ijazah')
+
+# --- Validasi kandidat data personal (dipanggil untuk setiap kandidat, bukan sekali per dokumen) ---
+_RE_PERSONAL_SANITIZE = re.compile(r'[^\w\s\.\-,\(\)/]')
+_RE_HAS_LETTER = re.compile(r'[a-zA-Z]')
+_RE_BIN_BINTI = re.compile(r'\b(bin|binti)\b', re.IGNORECASE)
+_RE_NAME_MULTIWORD = re.compile(r"^(?:[A-Z][a-zA-Z\.\-']+\s+){1,}[A-Z][a-zA-Z\.\-']+$")
+_RE_NAME_SINGLE = re.compile(r"^[A-Z][a-zA-Z\s\.\-']+$")
+# Istilah peran/pihak perkara yang bukan nama individu
+_EXCLUDED_NAME_TERMS = frozenset([
+    "terdakwa", "penggugat", "tergugat", "pemohon", "kuasa hukum", "majelis hakim",
+    "saksi", "ahli", "jaksa penuntut umum", "panitera", "hakim ketua",
+    "hakim anggota", "panitera pengganti", "para terdakwa", "para penggugat",
+])
+# Satu pemindaian untuk semua istilah (juga mencakup kecocokan persis), dipakai pada teks yang sudah di-lower()
+_RE_EXCLUDED_NAME_TERM = re.compile('|'.join(re.escape(term) for term in sorted(_EXCLUDED_NAME_TERMS)))
+
 def setup_logging():
     LOG_FILE.parent.mkdir(parents=True, exist_ok=True)
     logging.basicConfig(
@@ -24,14 +108,21 @@ def setup_logging():
 
 class EnhancedPatternExtractor:
     """Mengelola koleksi pola regex yang digunakan untuk ekstraksi data."""
+    __slots__ = (
+        "NOMOR_PERKARA_PATTERNS", "DATE_PATTERNS", "JENIS_PERKARA_PATTERNS", "JENIS_PERKARA_FALLBACK",
+        "PASAL_ATOM_PATTERN", "PASAL_GLUE_PATTERN", "PERSONAL_PATTERNS", "STATUS_HUKUMAN_PATTERNS",
+        "NAMA_IDENTITY_PATTERN", "NAMA_IDENTITY_RUN_PATTERN", "NAMA_IDENTITY_KEYWORD_PATTERN",
+        "FACT_CLEANUP_CUT_PATTERN", "FACT_CLEANUP_SPAN_PATTERN"
+    )
+    
     def __init__(self):
         # Pattern untuk nomor perkara (Tidak Berubah)
         self.NOMOR_PERKARA_PATTERNS = [
-            re.compile(r"PUTUSAN\s+Nomor\s*[:\-]?\s*(\d{1,5}\/[\w\.\-]+?\/\d{4}\/[\w\.]+)", re.IGNORECASE),
-            re.compile(r"Nomor\s*[:\-]?\s*(\d{1,5}\/[\w\.\-]+?\/\d{4}\/[\w\.]+)", re.IGNORECASE),
-            re.compile(r"No\.\s*(\d{1,5}\/[\w\.\-]+?\/\d{4})", re.IGNORECASE),
-            re.compile(r"(\d{1,5}\/[\w\.\-]+?\/\d{4}(?:\/[\w\.]+)?)\s*\n", re.IGNORECASE),
-            re.compile(r"(\d{1,5}\s*[PKK]{1,2}\/[\w\.\-]+?\/\d{4})", re.IGNORECASE)
+            fast_re.compile(r"PUTUSAN\s+Nomor\s*[:\-]?\s*(\d{1,5}\/[\w\.\-]+?\/\d{4}\/[\w\.]+)", fast_re.IGNORECASE),
+            fast_re.compile(r"Nomor\s*[:\-]?\s*(\d{1,5}\/[\w\.\-]+?\/\d{4}\/[\w\.]+)", fast_re.IGNORECASE),
+            fast_re.compile(r"No\.\s*(\d{1,5}\/[\w\.\-]+?\/\d{4})", fast_re.IGNORECASE),
+            fast_re.compile(r"(\d{1,5}\/[\w\.\-]+?\/\d{4}(?:\/[\w\.]+)?)\s*\n", fast_re.IGNORECASE),
+            fast_re.compile(r"(\d{1,5}\s*[PKK]{1,2}\/[\w\.\-]+?\/\d{4})", fast_re.IGNORECASE)
         ]
         
         # Pattern untuk tanggal (Tidak Berubah)
@@ -62,33 +153,42 @@ class EnhancedPatternExtractor:
             re.compile(r"Ketenagakerjaan", re.IGNORECASE)
         ]
         
-        # Pattern untuk pasal (Tidak Berubah)
-        self.PASAL_PATTERNS = [
-            re.compile(
-                r"(?:terbukti|bersalah|melakukan\s+tindak\s+pidana|dihukum)\s+.*?"
-                r"(?:sebagaimana\s+diatur\s+dalam|melanggar|berdasarkan)\s+"
-                r"((?:Pasal\s+\d+(?:\s+Ayat\s*\(\d+\))?(?:\s+huruf\s+[a-zA-Z])?)"
-                r"(?:[\s\.\,\;]*(?:jo\.?|juncto|dan|atau|serta)?\s*Pasal\s+\d+(?:\s+Ayat\s*\(\d+\))?(?:\s+huruf\s+[a-zA-Z])?)*)"
-                r"(?:\s+Undang-Undang\s+Nomor\s+\d+)?",
-                re.IGNORECASE | re.DOTALL
-            ),
-            re.compile(
-                r"(?:menyatakan|memutuskan|menimbang|mengadili|berdasarkan)\s+.*?"
-                r"((?:Pasal\s+\d+(?:\s+Ayat\s*\(\d+\))?(?:\s+huruf\s+[a-zA-Z])?)"
-                r"(?:[\s\.\,\;]*(?:jo\.?|juncto|dan|atau|serta)?\s*Pasal\s+\d+(?:\s+Ayat\s*\(\d+\))?(?:\s+huruf\s+[a-zA-Z])?)*)"
-                r"(?:\s+Undang-Undang\s+Nomor\s+\d+)?",
-                re.IGNORECASE | re.DOTALL
-            ),
-            re.compile(r"((?:Pasal\s+\d+(?:\s+Ayat\s*\(\d+\))?(?:\s+huruf\s+[a-zA-Z])?)(?:[\s\.\,\;]*(?:jo\.?|juncto|dan|atau|serta)?\s*Pasal\s+\d+(?:\s+Ayat\s*\(\d+\))?(?:\s+huruf\s+[a-zA-Z])?)*)", re.IGNORECASE)
+        # Fallback jenis perkara untuk seluruh dokumen (teks sudah di-lowercase): (label kanonik, kata kunci literal,
+        # pola regex untuk kata kunci yang tidak literal). Urutan = prioritas. Kata kunci literal dicari dengan
+        # pencarian substring (`in`) yang jauh lebih cepat daripada alternasi regex; "tindak pidana korupsi"
+        # sudah tercakup oleh "korupsi".
+        self.JENIS_PERKARA_FALLBACK = [
+            ("Tindak Pidana Korupsi", ("korupsi", "suap", "gratifikasi", "tipikor"), None),
+            ("Narkotika", ("narkoba", "narkotika", "psikotropika"), None),
+            ("Pidana Khusus", (), re.compile(r'pidana\s+khusus|pid.sus')),
+            ("Pidana Umum", (), re.compile(r'pidana\s+umum|pid.umum')),
+            ("Perdata", ("perdata", "pdt"), None),
+            ("Tata Usaha Negara", ("tun",), re.compile(r'tata\s+usaha\s+negara'))
         ]
         
+        # Pattern untuk pasal: satu pasal tunggal ("Pasal 2 Ayat (1) huruf a") dicari secara linear,
+        # lalu pasal-pasal yang hanya dipisahkan kata penghubung (jo/juncto/dan/atau/serta) digabung
+        # menjadi satu rangkaian. Menggantikan pola DOTALL `.*?` berkonteks yang rawan backtracking;
+        # rangkaian yang ditemukan pola berkonteks tersebut selalu juga ditemukan oleh scan ini.
+        self.PASAL_ATOM_PATTERN = fast_re.compile(r"Pasal\s+\d+(?:\s+Ayat\s*\(\d+\))?(?:\s+huruf\s+[a-zA-Z])?", fast_re.IGNORECASE)
+        self.PASAL_GLUE_PATTERN = fast_re.compile(r"[\s\.\,\;]*(?:jo\.?|juncto|dan|atau|serta)?\s*", fast_re.IGNORECASE)
+        
         # --- PERBAIKAN DI SINI: Pattern untuk data personal (nama) ---
+        # Pola nama, alamat, status hukuman, dan tanggal tetap memakai `re`: dengan modul `regex`
+        # pola nama yang panjang dan berulang justru lebih lambat.
         # Pola disempurnakan untuk lebih akurat menangkap nama dan memfilter noise
+        nama_identity_keywords = r"(?:Tempat\s+lahir|TTL|lahir|Umur|Usia|Jenis\s+Kelamin|Pekerjaan|Alamat|Pekerjaan|Jabatan)"
+        self.NAMA_IDENTITY_PATTERN = re.compile(r"(?:Terdakwa|Penggugat|Tergugat|Pemohon|Pembanding|Terbanding|Kuasa Hukum|Jaksa Penuntut Umum|Penasehat Hukum|Saksi|Ahli)?\s*[:\-\,\.\(\)\s]*([A-Za-z][a-zA-Z\s\.\-']{2,80}(?:\s+(?:bin|binti)\s+[A-Za-z][a-zA-Z\s\.\-']{2,80})?)(?:\s*,)?\s*" + nama_identity_keywords, re.IGNORECASE)
+        # Semua karakter yang bisa muncul dalam kecocokan NAMA_IDENTITY_PATTERN (huruf, spasi, dan : - , . ( ) ').
+        # Kecocokan tidak pernah melewati karakter lain, jadi teks cukup dipindai per deretan karakter ini,
+        # dan pola mahal itu hanya dijalankan pada deretan yang memuat kata kunci identitas.
+        self.NAMA_IDENTITY_RUN_PATTERN = re.compile(r"[A-Za-z\s\.\-'\:\,\(\)]+", re.IGNORECASE)
+        self.NAMA_IDENTITY_KEYWORD_PATTERN = re.compile(nama_identity_keywords, re.IGNORECASE)
         self.PERSONAL_PATTERNS = {
             'nama': [
                 # Pola terkuat: Nama yang diikuti oleh info identitas (TTL, Umur, JK, Pekerjaan, Alamat)
                 # Menangkap nama, opsional gelar/peran di depannya, lalu nama utama, opsional bin/binti.
-                re.compile(r"(?:Terdakwa|Penggugat|Tergugat|Pemohon|Pembanding|Terbanding|Kuasa Hukum|Jaksa Penuntut Umum|Penasehat Hukum|Saksi|Ahli)?\s*[:\-\,\.\(\)\s]*([A-Za-z][a-zA-Z\s\.\-']{2,80}(?:\s+(?:bin|binti)\s+[A-Za-z][a-zA-Z\s\.\-']{2,80})?)(?:\s*,)?\s*(?:Tempat\s+lahir|TTL|lahir|Umur|Usia|Jenis\s+Kelamin|Pekerjaan|Alamat|Pekerjaan|Jabatan)", re.IGNORECASE),
+                self.NAMA_IDENTITY_PATTERN,
                 # Nama Lengkap: [Nama] atau Nama : [Nama]
                 re.compile(r"(?:Nama|Nama Lengkap)\s*[:\-]?\s*([A-Za-z][a-zA-Z\s\.\-']{2,80}(?:\s+(?:bin|binti)\s+[A-Za-z][a-zA-Z\s\.\-']{2,80})?)", re.IGNORECASE),
                 # Peran: [Terdakwa/Penggugat/dll.]: [Nama]
@@ -99,36 +199,62 @@ class EnhancedPatternExtractor:
                 re.compile(r"(?:menyatakan|menjatuhkan)\s+(?:pidana|hukuman)\s+kepada\s+(?:Terdakwa|Para Terdakwa|Anak)\s+([A-Za-z][a-zA-Z\s\.\-']{2,80}(?:\s+(?:bin|binti)\s+[A-Za-z][a-zA-Z\s\.\-']{2,80})?)", re.IGNORECASE)
             ],
             'umur': [
-                re.compile(r"Umur[\/\s]*Tanggal\s*lahir\s*[:\-]?\s*(\d{1,3})\s*(?:tahun|thn)", re.IGNORECASE),
-                re.compile(r"Umur\s*[:\-]?\s*(\d{1,3})\s*(?:tahun|thn)", re.IGNORECASE)
+                fast_re.compile(r"Umur[\/\s]*Tanggal\s*lahir\s*[:\-]?\s*(\d{1,3})\s*(?:tahun|thn)", fast_re.IGNORECASE),
+                fast_re.compile(r"Umur\s*[:\-]?\s*(\d{1,3})\s*(?:tahun|thn)", fast_re.IGNORECASE)
             ],
             'jenis_kelamin': [
-                re.compile(r"Jenis\s+Kelamin\s*[:\-]?\s*(Laki-laki|Perempuan|L|P)\b", re.IGNORECASE),
-                re.compile(r"Kelamin\s*[:\-]?\s*(Laki-laki|Perempuan|L|P)\b", re.IGNORECASE)
+                fast_re.compile(r"Jenis\s+Kelamin\s*[:\-]?\s*(Laki-laki|Perempuan|L|P)\b", fast_re.IGNORECASE),
+                fast_re.compile(r"Kelamin\s*[:\-]?\s*(Laki-laki|Perempuan|L|P)\b", fast_re.IGNORECASE)
             ],
             'pekerjaan': [
-                re.compile(r"Pekerjaan\s*[:\-]?\s*([^:\n]{3,60})", re.IGNORECASE),
-                re.compile(r"Jabatan\s*[:\-]?\s*([^:\n]{3,60})", re.IGNORECASE)
+                fast_re.compile(r"Pekerjaan\s*[:\-]?\s*([^:\n]{3,60})", fast_re.IGNORECASE),
+                fast_re.compile(r"Jabatan\s*[:\-]?\s*([^:\n]{3,60})", fast_re.IGNORECASE)
             ],
             'alamat': [
+                # Backtracking antara [^:\n]{10,250} dan \s* sebelum kata kunci dibatasi panjang deretan whitespace;
+                # clean_text sudah meringkas spasi/tab dan baris baru berulang, sehingga per kemunculan
+                # "Alamat" biayanya tetap O(250). Pola sengaja tidak diubah agar hasil ekstraksi alamat tetap sama.
                 re.compile(r"(?:Tempat\s+Tinggal|Alamat)\s*[:\-]?\s*([^:\n]{10,250}\.?\s*(?:RT|RW|No|Jalan|Kelurahan|Kecamatan|Kota|Kabupaten|Provinsi)\s*[^:\n]{5,100})?", re.IGNORECASE),
                 re.compile(r"beralamat\s+di\s+([^:\n]{10,250}\.?\s*(?:RT|RW|No|Jalan|Kelurahan|Kecamatan|Kota|Kabupaten|Provinsi)\s*[^:\n]{5,100})?", re.IGNORECASE)
             ]
         }
 
+        # Pola status hukuman: jarak antar kata kunci dibatasi (.{0,2000}?) alih-alih `.*?` DOTALL
+        # yang bisa menjelajah seluruh sisa dokumen untuk setiap posisi awal. Batas 2000 karakter
+        # masih mencakup semua kalimat amar pada data contoh. `.*?` sebelum `[^\.]*` selalu kosong, jadi dihapus.
         self.STATUS_HUKUMAN_PATTERNS = [
-            re.compile(r'(?:menyatakan|mengadili).*?(?:terbukti|bersalah|tidak\s+terbukti|bebas|dihukum|dipidana).*?dengan\s+pidana\s+([^.\n]{20,300}\.?)(?:\n|$)', re.IGNORECASE | re.DOTALL),
-            re.compile(r'(?:menyatakan|memutuskan|mengadili).*?(?:terbukti\s+secara\s+sah\s+dan\s+meyakinkan|bersalah|tidak\s+terbukti|bebas)[^\.]*\.?', re.IGNORECASE | re.DOTALL),
-            re.compile(r'(?:pidana|hukuman).*?(?:penjara|denda|kurungan|rehabilitasi|bebas).*?[^\.]*\.?', re.IGNORECASE | re.DOTALL),
-            re.compile(r'(?:terdakwa|pemohon).*?(?:dipidana|dijatuhi|dihukum).*?[^\.]*\.?', re.IGNORECASE | re.DOTALL)
+            re.compile(r'(?:menyatakan|mengadili).{0,2000}?(?:terbukti|bersalah|tidak\s+terbukti|bebas|dihukum|dipidana).{0,2000}?dengan\s+pidana\s+([^.\n]{20,300}\.?)(?:\n|$)', re.IGNORECASE | re.DOTALL),
+            re.compile(r'(?:menyatakan|memutuskan|mengadili).{0,2000}?(?:terbukti\s+secara\s+sah\s+dan\s+meyakinkan|bersalah|tidak\s+terbukti|bebas)[^\.]*\.?', re.IGNORECASE | re.DOTALL),
+            re.compile(r'(?:pidana|hukuman).{0,2000}?(?:penjara|denda|kurungan|rehabilitasi|bebas)[^\.]*\.?', re.IGNORECASE | re.DOTALL),
+            re.compile(r'(?:terdakwa|pemohon).{0,2000}?(?:dipidana|dijatuhi|dihukum)[^\.]*\.?', re.IGNORECASE | re.DOTALL)
         ]
 
+        # Pembersihan akhir ringkasan fakta. Lima pola "X.*$" dulu dijalankan berurutan dan
+        # masing-masing memotong teks sampai akhir, jadi hasilnya sama dengan memotong di
+        # kemunculan paling awal -> cukup satu search. Alternatif Kepaniteraan hanya berlaku
+        # jika alamat email-nya muncul sebelum potongan Disclaimer/Halaman/MAHKAMAH AGUNG.
+        self.FACT_CLEANUP_CUT_PATTERN = re.compile(
+            r'Disclaimer\s*[:\-]'
+            r'|Halaman\s+\d+\s+dari\s+\d+'
+            r'|MAHKAMAH\s+AGUNG'
+            r'|Kepaniteraan(?:(?!Disclaimer\s*[:\-]|Halaman\s+\d+\s+dari\s+\d+|MAHKAMAH\s+AGUNG).)*@mahkamahagung\.go\.id'
+            r'|Catatan\s*:\s*Putusan\s*ini',
+            re.IGNORECASE | re.DOTALL
+        )
+        # SALINAN...PANITERA menghapus rentang di tengah teks (bukan pemotongan), tetap sub terpisah
+        self.FACT_CLEANUP_SPAN_PATTERN = re.compile(r'\bSALINAN\b[\s\S]*?\bPANITERA\b', re.IGNORECASE | re.DOTALL)
+
+# Tabel pola dibangun sekali per proses dan dipakai bersama oleh semua ImprovedSmartExtractor
+_SHARED_PATTERNS = EnhancedPatternExtractor()
+
 class ImprovedSmartExtractor:
     """
     Kelas untuk mengekstrak metadata terstruktur dari teks dokumen hukum mentah.
     """
+    __slots__ = ("patterns", "logger", "BULAN_MAP")
+    
     def __init__(self):
-        self.patterns = EnhancedPatternExtractor()
+        self.patterns = _SHARED_PATTERNS
         self.logger = logging.getLogger(__name__)
         
         self.BULAN_MAP = {
@@ -143,20 +269,23 @@ class ImprovedSmartExtractor:
             return ""
         
         text = text.replace('\x00', ' ').replace('\xa0', ' ')
-        text = re.sub(r'[\r\n]+', '\n', text)
-        text = re.sub(r'[ \t]+', ' ', text)
-        text = re.sub(r'\s*\(\s*', '(', text)
-        text = re.sub(r'\s*\)\s*', ')', text)
+        text = _RE_CRLF.sub('\n', text)
+        text = _RE_WS.sub(' ', text)
+        text = _RE_OPENPAREN.sub('(', text)
+        text = _RE_CLOSEPAREN.sub(')', text)
         return text.strip()
 
     def _find_first_valid_match(self, text: str, patterns: List[re.Pattern], search_limit: int) -> str:
-        """Mencari dan mengembalikan match pertama yang valid (Tidak Berubah)."""
-        search_area = text[:search_limit]
+        """
+        Mencari dan mengembalikan match pertama yang valid.
+        Pola dicoba berurutan karena urutan daftar adalah prioritas: satu alternasi gabungan akan
+        mengembalikan match dengan posisi paling awal, bukan match dari pola berprioritas tertinggi.
+        """
         for pattern in patterns:
-            match = pattern.search(search_area)
+            match = pattern.search(text, 0, search_limit)
             if match:
                 result = match.group(1).strip() if len(match.groups()) > 0 else match.group(0).strip()
-                result = re.sub(r'\s+', ' ', result).strip()
+                result = _RE_WS_RUN.sub(' ', result).strip()
                 if result:
                     return result
         return ""
@@ -169,16 +298,19 @@ class ImprovedSmartExtractor:
 
     def extract_tanggal(self, text: str) -> str:
         """Ekstrak tanggal (Tidak Berubah)."""
-        search_area = text[:8000] 
+        # Batas area pencarian diberikan lewat endpos agar tidak perlu menyalin prefix teks
+        search_end = min(len(text), 8000)
+        # Batas tahun dihitung sekali per dokumen, bukan untuk setiap kandidat tanggal
+        max_year = datetime.now().year + 5
         
         for pattern in self.patterns.DATE_PATTERNS:
-            matches = pattern.finditer(search_area)
+            matches = pattern.finditer(text, 0, search_end)
             for match in matches:
                 start_pos = max(0, match.start() - 150)
-                end_pos = min(len(search_area), match.end() + 150)
-                context = search_area[start_pos:end_pos].lower()
+                end_pos = min(search_end, match.end() + 150)
+                context = text[start_pos:end_pos].lower()
                 
-                if any(keyword in context for keyword in ['lahir', 'usia', 'umur', 'ktp', 'identitas', 'akta', 'ijazah']):
+                if any(keyword in context for keyword in _DATE_CONTEXT_SKIP_KEYWORDS):
                     self.logger.debug(f"Skipping date '{match.group(0)}' due to context: {context[:50]}...")
                     continue
                 
@@ -189,19 +321,19 @@ class ImprovedSmartExtractor:
                     day, month, year = match.group(1), match.group(2), match.group(3)
                 
                 if day and month and year:
-                    if month.lower() in self.BULAN_MAP:
-                        month_str = self.BULAN_MAP[month.lower()]
-                    elif month.isdigit() and 1 <= int(month) <= 12:
-                        month_str = f"{int(month):02d}"
-                    else:
-                        continue
+                    month_str = self.BULAN_MAP.get(month.lower())
+                    if month_str is None:
+                        if month.isdigit() and 1 <= int(month) <= 12:
+                            month_str = f"{int(month):02d}"
+                        else:
+                            continue
 
                     try:
                         day_num = int(day)
                         year_num = int(year)
                         month_num = int(month_str)
                         
-                        if 1 <= day_num <= 31 and 1 <= month_num <= 12 and 1990 <= year_num <= datetime.now().year + 5:
+                        if 1 <= day_num <= 31 and 1 <= month_num <= 12 and 1990 <= year_num <= max_year:
                             return f"{year_num}-{month_str}-{int(day_num):02d}"
                     except ValueError:
                         continue
@@ -214,18 +346,9 @@ class ImprovedSmartExtractor:
             return jenis.title()
         
         text_lower = text.lower()
-        if re.search(r'tindak\s+pidana\s+korupsi|korupsi|suap|gratifikasi|tipikor', text_lower):
-            return "Tindak Pidana Korupsi"
-        elif re.search(r'narkoba|narkotika|psikotropika', text_lower):
-            return "Narkotika"
-        elif re.search(r'pidana\s+khusus|pid.sus', text_lower):
-            return "Pidana Khusus"
-        elif re.search(r'pidana\s+umum|pid.umum', text_lower):
-            return "Pidana Umum"
-        elif re.search(r'perdata|pdt', text_lower):
-            return "Perdata"
-        elif re.search(r'tata\s+usaha\s+negara|tun', text_lower):
-            return "Tata Usaha Negara"
+        for label, keywords, pattern in self.patterns.JENIS_PERKARA_FALLBACK:
+            if any(keyword in text_lower for keyword in keywords) or (pattern and pattern.search(text_lower)):
+                return label
         
         return ""
 
@@ -233,46 +356,67 @@ class ImprovedSmartExtractor:
         """Ekstrak pasal-pasal yang dilanggar (Tidak Berubah, sudah diperbaiki di iterasi sebelumnya)."""
         pasal_found = set()
         
-        for pattern in self.patterns.PASAL_PATTERNS:
-            matches = pattern.finditer(text)
-            for match in matches:
-                pasal_text = match.group(1).strip() if len(match.groups()) > 0 else match.group(0).strip()
-                
-                pasal_text = re.sub(r'\s+', ' ', pasal_text)
-                pasal_text = re.sub(r'Ayat\s*\(\s*(\d+)\s*\)', r'Ayat (\1)', pasal_text, re.IGNORECASE)
-                pasal_text = re.sub(r'huruf\s*([a-zA-Z])', r'huruf \1', pasal_text, re.IGNORECASE)
-                pasal_text = pasal_text.replace("jo.", "jo").replace("juncto", "jo").replace("serta", "dan").replace("atau", "dan")
+        # Gabungkan pasal tunggal yang berdekatan menjadi rangkaian (start, end)
+        chains = []
+        for match in self.patterns.PASAL_ATOM_PATTERN.finditer(text):
+            if chains and self.patterns.PASAL_GLUE_PATTERN.fullmatch(text, chains[-1][1], match.start()):
+                chains[-1][1] = match.end()
+            else:
+                chains.append([match.start(), match.end()])
+        
+        for chain_start, chain_end in chains:
+            pasal_text = text[chain_start:chain_end].strip()
+            
+            pasal_text = _RE_WS_RUN.sub(' ', pasal_text)
+            pasal_text = _RE_AYAT.sub(r'Ayat (\1)', pasal_text)
+            pasal_text = _RE_HURUF.sub(r'huruf \1', pasal_text)
+            pasal_text = pasal_text.replace("jo.", "jo").replace("juncto", "jo").replace("serta", "dan").replace("atau", "dan")
 
-                sub_pasals = re.split(r'\s+(?:jo|dan)\s+', pasal_text, flags=re.IGNORECASE)
-                
-                for p in sub_pasals:
-                    p = p.strip()
-                    if re.search(r'Pasal\s+\d+', p, re.IGNORECASE):
-                        if 5 <= len(p) <= 150:
-                            pasal_found.add(p.title())
+            sub_pasals = _RE_SPLIT_JO.split(pasal_text)
+            
+            for p in sub_pasals:
+                p = p.strip()
+                if _RE_PASAL_CHECK.search(p):
+                    if 5 <= len(p) <= 150:
+                        pasal_found.add(p.title())
 
         return sorted(list(pasal_found))
 
     # --- PERBAIKAN DI SINI: extract_personal_data (untuk nama) ---
+    def _find_nama_identity(self, text: str, search_end: int) -> List[str]:
+        """
+        Sama dengan NAMA_IDENTITY_PATTERN.findall(text, 0, search_end), tetapi pola hanya dijalankan
+        pada deretan karakter nama yang memuat kata kunci identitas (TTL, Umur, Pekerjaan, dst.).
+        """
+        matches = []
+        for run in self.patterns.NAMA_IDENTITY_RUN_PATTERN.finditer(text, 0, search_end):
+            run_start, run_end = run.span()
+            if self.patterns.NAMA_IDENTITY_KEYWORD_PATTERN.search(text, run_start, run_end):
+                matches.extend(self.patterns.NAMA_IDENTITY_PATTERN.findall(text, run_start, run_end))
+        return matches
+
     def extract_personal_data(self, text: str, field: str) -> str:
         """Ekstrak data personal berdasarkan field dengan validasi lebih ketat."""
         if field not in self.patterns.PERSONAL_PATTERNS:
             return ""
         
-        search_area = text[:20000] # Perluas area pencarian untuk data personal
+        search_end = 20000 # Perluas area pencarian untuk data personal (dipakai sebagai endpos, tanpa menyalin teks)
         
         best_match_value = "" # Untuk menyimpan kandidat nama terbaik
         
         for pattern in self.patterns.PERSONAL_PATTERNS[field]:
-            matches = pattern.findall(search_area)
+            if pattern is self.patterns.NAMA_IDENTITY_PATTERN:
+                matches = self._find_nama_identity(text, search_end)
+            else:
+                matches = pattern.findall(text, 0, search_end)
             if matches:
                 for match in matches:
-                    # Ambil group pertama jika itu tuple (dari capture group), atau match langsung
-                    value = match[0].strip() if isinstance(match, tuple) else match.strip()
+                    # Semua pola data personal memiliki tepat satu capture group, jadi findall mengembalikan string
+                    value = match.strip()
                     
                     # Pembersihan umum dari karakter yang tidak diinginkan dalam nama/teks
-                    value = re.sub(r'[^\w\s\.\-,\(\)/]', '', value).strip()
-                    value = re.sub(r'\s+', ' ', value).strip() # Normalisasi spasi
+                    value = _RE_PERSONAL_SANITIZE.sub('', value).strip()
+                    value = _RE_WS_RUN.sub(' ', value).strip() # Normalisasi spasi
 
                     # Validasi spesifik per bidang
                     if field == 'umur':
@@ -283,30 +427,27 @@ class ImprovedSmartExtractor:
                             return "Laki-laki" if value.lower() in ['laki-laki', 'l'] else "Perempuan"
                     elif field == 'nama':
                         # Kriteria validasi nama
-                        if len(value) < 3 or not re.search(r'[a-zA-Z]', value): # Harus punya huruf dan cukup panjang
+                        if len(value) < 3 or not _RE_HAS_LETTER.search(value): # Harus punya huruf dan cukup panjang
                             continue
                         
                         # Filter nama yang terlalu umum atau bukan nama individu
-                        excluded_terms = ["terdakwa", "penggugat", "tergugat", "pemohon", "kuasa hukum", "majelis hakim", 
-                                          "saksi", "ahli", "jaksa penuntut umum", "panitera", "hakim ketua", 
-                                          "hakim anggota", "panitera pengganti", "para terdakwa", "para penggugat"]
-                        if value.lower() in excluded_terms or any(term in value.lower() for term in excluded_terms):
+                        if _RE_EXCLUDED_NAME_TERM.search(value.lower()):
                             continue
 
                         # Jika nama mengandung "bin" atau "binti", itu indikator kuat nama lengkap
-                        if re.search(r'\b(bin|binti)\b', value, re.IGNORECASE) and len(value.split()) >= 3:
+                        if _RE_BIN_BINTI.search(value) and len(value.split()) >= 3:
                             # Prioritas tinggi: jika ini ditemukan, langsung kembalikan
                             return value.title() 
 
                         # Cek apakah nama terdiri dari 2 kata atau lebih dan setiap kata dimulai kapital
                         # Contoh: "Budi Santoso", "Dr. A. Yani"
-                        if re.match(r"^(?:[A-Z][a-zA-Z\.\-']+\s+){1,}[A-Z][a-zA-Z\.\-']+$", value):
+                        if _RE_NAME_MULTIWORD.match(value):
                             # Jika ini lebih panjang atau lebih spesifik dari kandidat sebelumnya
                             if len(value) > len(best_match_value):
                                 best_match_value = value.title() # Simpan sebagai kandidat terbaik
                             
                         # Fallback untuk nama satu kata kapital atau dua kata dengan kapital di awal saja
-                        elif len(value.split()) >= 1 and re.match(r"^[A-Z][a-zA-Z\s\.\-']+$", value):
+                        elif len(value.split()) >= 1 and _RE_NAME_SINGLE.match(value):
                              if len(value) > len(best_match_value): # Simpan jika lebih panjang
                                 best_match_value = value.title()
                         
@@ -325,14 +466,15 @@ class ImprovedSmartExtractor:
 
     def extract_status_hukuman(self, text: str) -> str:
         """Ekstrak status hukuman/putusan (Sudah diperbaiki dari error sebelumnya)."""
-        search_area = text[-7000:] if len(text) > 7000 else text
+        # Hanya 7000 karakter terakhir yang diperiksa; posisi awal diberikan lewat pos tanpa menyalin teks.
+        # Pola status tidak memakai ^, \b, atau lookbehind, sehingga hasilnya sama dengan memotong teks.
+        search_start = max(0, len(text) - 7000)
         
         # Menggunakan pola yang sudah dikompilasi dari EnhancedPatternExtractor
         for pattern in self.patterns.STATUS_HUKUMAN_PATTERNS:
-            matches = re.findall(pattern, search_area)
-            for match in matches:
-                status_text = match[0].strip() if isinstance(match, tuple) else match.strip()
-                status_text = re.sub(r'\s+', ' ', status_text).strip()
+            # findall mengembalikan string langsung: grup 1 jika pola punya grup, atau seluruh match jika tidak
+            for status_text in pattern.findall(text, search_start):
+                status_text = _RE_WS_RUN.sub(' ', status_text).strip()
                 
                 if 30 <= len(status_text) <= 500:
                     return status_text
@@ -349,34 +491,11 @@ class ImprovedSmartExtractor:
         if not text:
             return ""
 
-        # Pola untuk menandai awal dan akhir potensial dari ringkasan fakta
-        start_keywords = [
-            re.compile(r'DUDUK\s+PERKARA', re.IGNORECASE),
-            re.compile(r'I\.\s*PERKARA', re.IGNORECASE),
-            re.compile(r'FAKTA-FAKTA', re.IGNORECASE),
-            re.compile(r'MENIMBANG(?:\s+BAHWA|\,\s+bahwa)?\s+permohonan', re.IGNORECASE),
-            re.compile(r'DALAM\s+POKOK\s+PERKARA', re.IGNORECASE),
-            re.compile(r'TENTANG\s+PERKARA', re.IGNORECASE),
-            re.compile(r'POKOK\s+GUGATAN', re.IGNORECASE), # Untuk perdata/TUN
-            re.compile(r'URAIAN\s+PERBUATAN', re.IGNORECASE), # Untuk pidana
-        ]
-        
-        end_keywords = [
-            re.compile(r'TENTANG\s+HUKUM', re.IGNORECASE),
-            re.compile(r'MENIMBANG(?:\s+TENTANG|\,\s+tentang)?\s+HUKUM', re.IGNORECASE),
-            re.compile(r'DALAM\s+PERTIMBANGAN\s+HUKUM', re.IGNORECASE),
-            re.compile(r'MEMUTUSKAN', re.IGNORECASE),
-            re.compile(r'MENGADILI', re.IGNORECASE),
-            re.compile(r'AMAR\s+PUTUSAN', re.IGNORECASE),
-            re.compile(r'DALAM\s+EKSEPSI', re.IGNORECASE), # Jika ada eksepsi setelah fakta
-            re.compile(r'Demikian\s+diputus\s+dalam\s+rapat\s+musyawarah', re.IGNORECASE),
-        ]
-
         fact_start_pos = -1
         fact_end_pos = -1
 
         # Cari awal bagian fakta
-        for pattern in start_keywords:
+        for pattern in _RE_FACT_START:
             match = pattern.search(text)
             if match:
                 fact_start_pos = match.end()
@@ -384,7 +503,7 @@ class ImprovedSmartExtractor:
 
         # Cari akhir bagian fakta (mulai pencarian dari fact_start_pos jika ditemukan)
         search_from = fact_start_pos if fact_start_pos != -1 else 0
-        for pattern in end_keywords:
+        for pattern in _RE_FACT_END:
             match = pattern.search(text, search_from)
             if match:
                 fact_end_pos = match.start()
@@ -403,25 +522,19 @@ class ImprovedSmartExtractor:
         else: # Fallback: tidak ada penanda jelas, coba ekstrak dari blok teks substansial
             self.logger.debug("No clear fact markers found. Using heuristic fallback.")
             # Hapus header umum yang sangat mungkin ada di awal dokumen
-            text_after_header_clean = re.sub(
-                r'^(?:PUTUSAN\s+NOMOR\s+[\s\S]*?DENGAN\s+RAHMAT\s+TUHAN\s+YANG\s+MAHA\s+ESA|PENGADILAN\s+NEGERI.*?\n+)*',
-                '', text, flags=re.IGNORECASE | re.DOTALL
-            ).strip()
-
-            # Ambil beberapa paragraf pertama yang substansial
-            lines = text_after_header_clean.split('\n')
-            
-            # Filter baris yang sangat pendek atau hanya berisi penomoran/artefak
-            content_candidate_lines = []
-            for line in lines:
-                stripped_line = line.strip()
-                # Hindari baris yang terlalu pendek, nomor halaman, atau baris yang terlalu berulang
-                if len(stripped_line) > 50 and not re.fullmatch(r'^\s*[-_]?\s*\d+\s*[-_]?\s*$', stripped_line) and \
-                   not re.fullmatch(r'^\s*[A-Z\s]+\s*$', stripped_line) and \
-                   not re.fullmatch(r'^[\s\W_]*$', stripped_line): # Bukan hanya simbol
-                    content_candidate_lines.append(stripped_line)
-                elif len(stripped_line) > 10 and re.search(r'[a-zA-Z0-9]', stripped_line): # Keep reasonably long lines with words
-                    content_candidate_lines.append(stripped_line)
+            text_after_header_clean = _RE_FACT_HEADER.sub('', text).strip()
+
+            # Ambil baris yang substansial: baris > 10 karakter yang memuat huruf/angka ASCII, atau
+            # baris > 50 karakter yang bukan nomor halaman/hanya simbol. Baris huruf kapital semua dan
+            # nomor halaman berangka ASCII selalu lolos lewat cek huruf/angka, jadi cek murah itu didahulukan
+            # dan regex baris penuh hanya dijalankan untuk sisa baris panjang tanpa huruf/angka ASCII.
+            content_candidate_lines = [
+                line for line in map(str.strip, text_after_header_clean.split('\n'))
+                if len(line) > 10 and (
+                    _RE_ALNUM.search(line)
+                    or (len(line) > 50 and not _RE_SYMBOL_LINE.fullmatch(line) and not _RE_PAGE_NUMBER_LINE.fullmatch(line))
+                )
+            ]
 
             extracted_content = "\n".join(content_candidate_lines).strip()
             self.logger.debug(f"Fallback extracted content length: {len(extracted_content)}")
@@ -430,16 +543,10 @@ class ImprovedSmartExtractor:
         extracted_content = self.clean_text(extracted_content) # Bersihkan lagi setelah segmentasi
         
         # Hapus sisa-sisa pola umum yang tidak diinginkan, tapi dengan hati-hati
-        general_cleanup_patterns = [
-            re.compile(r'Disclaimer\s*[:\-].*$', re.IGNORECASE | re.DOTALL),
-            re.compile(r'Halaman\s+\d+\s+dari\s+\d+.*$', re.IGNORECASE | re.DOTALL),
-            re.compile(r'MAHKAMAH\s+AGUNG.*$', re.IGNORECASE | re.DOTALL),
-            re.compile(r'Kepaniteraan.*@mahkamahagung\.go\.id.*$', re.IGNORECASE | re.DOTALL),
-            re.compile(r'Catatan\s*:\s*Putusan\s*ini.*$', re.IGNORECASE | re.DOTALL),
-            re.compile(r'\bSALINAN\b[\s\S]*?\bPANITERA\b', re.IGNORECASE | re.DOTALL),
-        ]
-        for pattern in general_cleanup_patterns:
-            extracted_content = re.sub(pattern, '', extracted_content) # Apply already compiled patterns
+        cut = self.patterns.FACT_CLEANUP_CUT_PATTERN.search(extracted_content)
+        if cut:
+            extracted_content = extracted_content[:cut.start()]
+        extracted_content = self.patterns.FACT_CLEANUP_SPAN_PATTERN.sub('', extracted_content)
         extracted_content = self.clean_text(extracted_content) # Bersihkan final
 
         # Potong sesuai panjang maksimal
@@ -455,10 +562,7 @@ class ImprovedSmartExtractor:
         if len(extracted_content) < min_len and len(text) >= min_len:
             self.logger.warning(f"Extracted facts too short ({len(extracted_content)} chars). Original text had {len(text)} chars. Attempting aggressive fallback.")
             # Ambil bagian awal teks setelah header yang sangat umum (lebih berani)
-            aggressive_fallback_text = re.sub(
-                r'^(.*?PUTUSAN\s+NOMOR\s+[\s\S]*?(?:DENGAN\s+RAHMAT\s+TUHAN\s+YANG\s+MAHA\s+ESA|MAJELIS\s+HAKIM|MENIMBANG|MENGADILI)\s*?\n+)?',
-                '', text, flags=re.IGNORECASE | re.DOTALL
-            )
+            aggressive_fallback_text = _RE_FACT_HEADER_AGGRESSIVE.sub('', text)
             aggressive_fallback_text = self.clean_text(aggressive_fallback_text)
             if len(aggressive_fallback_text) > min_len:
                 return aggressive_fallback_text[:min_len].strip() + "..."
@@ -494,6 +598,71 @@ class ImprovedSmartExtractor:
         
         return metadata
 
+# Extractor per proses worker, dibuat sekali oleh _init_worker
+_worker_extractor: Optional["ImprovedSmartExtractor"] = None
+
+def _init_worker():
+    """Initializer proses worker: siapkan logging dan buat extractor sekali per proses."""
+    global _worker_extractor
+    setup_logging()
+    _worker_extractor = ImprovedSmartExtractor()
+
+def _process_one(path_str: str) -> Tuple[str, Optional[Dict[str, str]], str]:
+    """
+    Proses satu file txt di dalam proses worker.
+    
+    Returns:
+        Tuple[str, Optional[Dict[str, str]], str]: (status, metadata, pesan error) dengan status
+        "ok", "empty", atau "error". Metadata hanya diisi untuk status "ok".
+    """
+    logger = logging.getLogger(__name__)
+    file_path = Path(path_str)
+    current_case_id = file_path.stem
+    try:
+        logger.info(f"Processing {file_path.name}")
+        
+        # Baca sekali sebagai bytes lalu decode sekaligus (tanpa lapisan TextIOWrapper). Konversi baris
+        # baru meniru mode teks universal newlines agar teks (dan file_size) sama seperti open(..., 'r').
+        text = file_path.read_bytes().decode('utf-8')
+        if '\r' in text:
+            text = text.replace('\r\n', '\n').replace('\r', '\n')
+        
+        if not text.strip():
+            logger.warning(f"File {file_path.name} is empty. Skipping.")
+            return "empty", None, ""
+        
+        metadata = _worker_extractor.extract_metadata(text)
+        
+        if metadata.get("no_perkara") and len(metadata["no_perkara"]) > 10:
+            current_case_id = metadata["no_perkara"].replace("/", "_").replace(".", "_").strip()
+        
+        metadata.update({
+            "case_id": current_case_id,
+            "file_name": file_path.name,
+            "file_size": len(text),
+            "processed_at": datetime.now().isoformat()
+        })
+        return "ok", metadata, ""
+        
+    except Exception as e:
+        logger.error(f"Failed to process {file_path.name} (ID: {current_case_id}): {e}", exc_info=True)
+        return "error", None, f"{file_path.name} (ID: {current_case_id}): {e}"
+
+def save_case_parquet(results: List[Dict[str, str]]):
+    """
+    Simpan salinan ringkas (kolom CASE_PARQUET_COLUMNS) dari cases.json sebagai parquet agar tahap
+    berikutnya tidak perlu mem-parse seluruh JSON. Dilewati jika pandas/pyarrow tidak tersedia.
+    """
+    logger = logging.getLogger(__name__)
+    if pd is None:
+        logger.info("pandas not installed; skipping parquet case cache.")
+        return
+    try:
+        pd.DataFrame(results, columns=CASE_PARQUET_COLUMNS).to_parquet(CASE_PARQUET_FILE, index=False)
+        logger.info(f"Saved compact case cache to {CASE_PARQUET_FILE}.")
+    except Exception as e:
+        logger.warning(f"Failed to write parquet case cache {CASE_PARQUET_FILE}: {e}")
+
 def process_all_cases():
     """Proses semua file txt dalam folder raw dan simpan sebagai JSON (Tidak Berubah)."""
     setup_logging()
@@ -502,7 +671,9 @@ def process_all_cases():
     RAW_DIR.mkdir(parents=True, exist_ok=True)
     OUTPUT_FILE.parent.mkdir(parents=True, exist_ok=True)
     
-    txt_files = list(RAW_DIR.glob("*.txt"))
+    # os.scandir tidak membuat objek Path per entri; urutan direktori sama seperti RAW_DIR.glob("*.txt")
+    with os.scandir(RAW_DIR) as entries:
+        txt_files = [entry.path for entry in entries if entry.name.endswith('.txt') and entry.is_file()]
     if not txt_files:
         logger.warning(f"No .txt files found in {RAW_DIR}. Please ensure raw text files are in this directory.")
         print(f"❌ Tidak ada file .txt ditemukan di {RAW_DIR}")
@@ -511,45 +682,23 @@ def process_all_cases():
     logger.info(f"Found {len(txt_files)} .txt files to process.")
     print(f"🔍 Ditemukan {len(txt_files)} file untuk diproses.")
     
-    extractor = ImprovedSmartExtractor()
     results = []
     success_count = 0
     error_count = 0
     
-    for file_path in txt_files:
-        current_case_id = file_path.stem
-        try:
-            logger.info(f"Processing {file_path.name}")
-            
-            with open(file_path, 'r', encoding='utf-8') as f:
-                text = f.read()
-            
-            if not text.strip():
-                logger.warning(f"File {file_path.name} is empty. Skipping.")
-                continue
-            
-            metadata = extractor.extract_metadata(text)
-            
-            if metadata.get("no_perkara") and len(metadata["no_perkara"]) > 10:
-                current_case_id = metadata["no_perkara"].replace("/", "_").replace(".", "_").strip()
-            
-            metadata.update({
-                "case_id": current_case_id,
-                "file_name": file_path.name,
-                "file_size": len(text),
-                "processed_at": datetime.now().isoformat()
-            })
-            
-            results.append(metadata)
-            success_count += 1
-            
-            found_count = sum(1 for k, v in metadata.items() if k not in ['case_id', 'file_name', 'file_size', 'processed_at'] and v and v.strip() and v not in ["N/A", "UNKNOWN"])
-            print(f"✅ {file_path.name} (ID: {current_case_id}) - {found_count} field terisi.")
-            
-        except Exception as e:
-            error_count += 1
-            logger.error(f"Failed to process {file_path.name} (ID: {current_case_id}): {e}", exc_info=True)
-            print(f"❌ Error processing {file_path.name} (ID: {current_case_id}): {e}")
+    # Ekstraksi per file sepenuhnya CPU-bound dan independen, sehingga diproses paralel antar proses.
+    # executor.map mempertahankan urutan file, jadi penanganan duplikat case_id tetap deterministik.
+    with ProcessPoolExecutor(initializer=_init_worker) as executor:
+        for status, metadata, error_message in executor.map(_process_one, txt_files, chunksize=POOL_CHUNKSIZE):
+            if status == "ok":
+                results.append(metadata)
+                success_count += 1
+                
+                found_count = sum(1 for k, v in metadata.items() if k not in ['case_id', 'file_name', 'file_size', 'processed_at'] and v and v.strip() and v not in ["N/A", "UNKNOWN"])
+                print(f"✅ {metadata['file_name']} (ID: {metadata['case_id']}) - {found_count} field terisi.")
+            elif status == "error":
+                error_count += 1
+                print(f"❌ Error processing {error_message}")
     
     if results:
         unique_case_ids = set()
@@ -570,6 +719,7 @@ def process_all_cases():
         
         logger.info(f"Successfully saved {len(results)} unique cases to {OUTPUT_FILE}.")
         print(f"💾 Berhasil menyimpan {len(results)} kasus unik ke {OUTPUT_FILE}.")
+        save_case_parquet(results)
         
         print(f"\n📊 STATISTIK EKSTRAKSI KESELURUHAN:")
         print(f"Total file .txt ditemukan: {len(txt_files)}")
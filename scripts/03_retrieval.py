@@ -1,33 +1,89 @@
 import os
 import json
+import contextlib
+import hashlib
+import heapq
+from collections import defaultdict
+from operator import itemgetter
 from pathlib import Path
 from typing import List, Dict, Any, Optional, Tuple
 import logging
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-from sentence_transformers import SentenceTransformer 
+from sklearn.feature_extraction.text import HashingVectorizer, TfidfTransformer
+from sentence_transformers import SentenceTransformer, CrossEncoder
 import numpy as np
-# from nltk.corpus import stopwords # Uncomment if using Indonesian stopwords
+from scipy import sparse
+import torch
+try:
+    from nltk.corpus import stopwords
+except ImportError:
+    stopwords = None
+# orjson (opsional) jauh lebih cepat untuk memuat file JSON besar; fallback ke modul json bawaan
+try:
+    import orjson
+except ImportError:
+    orjson = None
+# pandas (opsional) untuk membaca cache parquet kasus yang ditulis 02_case_representation.py
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
 
 
 # --- Konfigurasi ---
 CASE_BASE_PATH = Path("data/processed/cases.json")
+CASE_PARQUET_PATH = Path("data/processed/cases.parquet")
+# Kolom kasus yang dibutuhkan extract_case_text_for_retrieval (dibaca dari parquet jika tersedia)
+CASE_RETRIEVAL_COLUMNS = ["case_id", "ringkasan_fakta", "jenis_perkara", "pasal", "status_hukuman", "no_perkara", "tanggal"]
 QUERY_PATH = Path("data/eval/queries.json")
 OUTPUT_PATH = Path("data/results/retrieved_cases.json")
 TOP_K_SIMILAR_CASES = 10 # Meningkatkan K untuk memberikan lebih banyak kandidat ke prediksi, dapat diatur lebih lanjut.
+BERT_MODEL_NAME = 'paraphrase-multilingual-MiniLM-L12-v2'
+EMBEDDING_CACHE_DIR = CASE_BASE_PATH.parent / "embeddings" # Cache embedding & IDF kasus, disimpan di samping cases.json
+EMBEDDING_BATCH_SIZE = 64
+SIMILARITY_BLOCK_SIZE = 16384 # Jumlah kasus per blok saat menghitung top-k BERT (membatasi memori skor Q x N)
+RRF_K = 60 # Konstanta Reciprocal Rank Fusion untuk retrieval Hybrid
+# Reranking opsional dengan cross-encoder atas kandidat teratas retrieval Hybrid (lebih presisi, lebih lambat)
+USE_CROSS_ENCODER_RERANK = False
+CROSS_ENCODER_MODEL_NAME = 'cross-encoder/mmarco-mMiniLMv2-L12-H384-v1'
+TOP_K_RERANK = 50
+CROSS_ENCODER_BATCH_SIZE = 32
+TFIDF_N_FEATURES = 2 ** 18
+TFIDF_NGRAM_RANGE = (1, 2)
+TFIDF_QUERY_BLOCK_SIZE = 256 # Jumlah kueri per blok saat memilih top-k TF-IDF dari matriks sparse
+
+# Stopword dasar Bahasa Indonesia, dipakai jika korpus stopwords NLTK tidak tersedia
+INDONESIAN_STOPWORDS_FALLBACK = [
+    "yang", "dan", "di", "ke", "dari", "dengan", "untuk", "pada", "dalam", "oleh", "atau", "serta",
+    "ini", "itu", "tersebut", "adalah", "ialah", "akan", "telah", "sudah", "sebagai", "karena",
+    "bahwa", "tidak", "juga", "ada", "atas", "bagi", "bahkan", "hingga", "sampai", "kepada",
+    "terhadap", "secara", "agar", "maka", "namun", "tetapi", "jika", "apabila", "saat", "setelah",
+    "sebelum", "antara", "para", "pun", "lah", "nya", "se", "ia", "mereka", "kami", "kita", "saya",
+]
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
 logger = logging.getLogger(__name__)
 
 # --- Inisialisasi Model Global (untuk efisiensi) ---
+# Di GPU model dijalankan dalam fp16 (memori setengahnya, throughput encode lebih tinggi); di CPU tetap fp32
+BERT_DEVICE = 'cuda' if torch.cuda.is_available() else 'cpu'
 try:
-    BERT_MODEL = SentenceTransformer('paraphrase-multilingual-MiniLM-L12-v2')
-    logger.info("Sentence-BERT model loaded successfully.")
+    BERT_MODEL = SentenceTransformer(BERT_MODEL_NAME, device=BERT_DEVICE)
+    if BERT_DEVICE == 'cuda':
+        BERT_MODEL.half()
+    logger.info(f"Sentence-BERT model loaded successfully on {BERT_DEVICE}.")
 except Exception as e:
     logger.error(f"Failed to load Sentence-BERT model: {e}. BERT retrieval will not work.")
     BERT_MODEL = None 
 
+CROSS_ENCODER_MODEL = None
+if USE_CROSS_ENCODER_RERANK:
+    try:
+        CROSS_ENCODER_MODEL = CrossEncoder(CROSS_ENCODER_MODEL_NAME, device=BERT_DEVICE)
+        logger.info("Cross-encoder model loaded successfully.")
+    except Exception as e:
+        logger.error(f"Failed to load cross-encoder model: {e}. Hybrid results will not be reranked.")
+
 # --- Fungsi Utilitas ---
 
 def initialize_directories() -> bool:
@@ -51,8 +107,12 @@ def load_json_data(file_path: Path) -> Optional[List[Dict[str, Any]]]:
         return None
 
     try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
+        if orjson is not None:
+            with open(file_path, "rb") as f:
+                data = orjson.loads(f.read())
+        else:
+            with open(file_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
             
         if not isinstance(data, list):
             logger.error(f"Invalid data format in '{file_path}'. Expected a JSON array, got {type(data).__name__}.")
@@ -75,6 +135,24 @@ def load_json_data(file_path: Path) -> Optional[List[Dict[str, Any]]]:
         logger.error(f"Unexpected error reading '{file_path}': {e}")
         return None
 
+def load_case_data(columns: List[str]) -> Optional[List[Dict[str, Any]]]:
+    """
+    Memuat data kasus. Jika cache parquet dari 02_case_representation.py tersedia dan tidak lebih lama dari
+    cases.json, hanya kolom yang dibutuhkan yang dibaca dari parquet; selain itu kembali ke JSON.
+    """
+    if pd is not None and CASE_PARQUET_PATH.exists() and (
+        not CASE_BASE_PATH.exists() or CASE_PARQUET_PATH.stat().st_mtime >= CASE_BASE_PATH.stat().st_mtime
+    ):
+        try:
+            df = pd.read_parquet(CASE_PARQUET_PATH, columns=columns)
+            # Nilai kosong (NaN/None) dikembalikan sebagai None, sama seperti field yang tidak ada di JSON
+            records = df.astype(object).where(df.notna(), None).to_dict("records")
+            logger.info(f"Successfully loaded {len(records)} entries from '{CASE_PARQUET_PATH}'.")
+            return records
+        except Exception as e:
+            logger.warning(f"Failed to read parquet case cache '{CASE_PARQUET_PATH}': {e}. Falling back to JSON.")
+    return load_json_data(CASE_BASE_PATH)
+
 def extract_case_text_for_retrieval(case: Dict[str, Any]) -> Optional[str]:
     """
     Mengekstrak teks yang paling relevan dari sebuah kasus untuk tujuan retrieval.
@@ -109,18 +187,218 @@ def extract_case_text_for_retrieval(case: Dict[str, Any]) -> Optional[str]:
             
     return None
 
-def normalize_scores(scores: List[float]) -> List[float]:
-    """Menormalisasi daftar skor ke rentang [0, 1]."""
-    if not scores: # Menangani daftar skor kosong
-        return []
-    min_score = min(scores)
-    max_score = max(scores)
-    if max_score == min_score: 
-        return [0.0] * len(scores)
-    return [(s - min_score) / (max_score - min_score) for s in scores]
+def normalize_scores(scores: Any) -> np.ndarray:
+    """
+    Menormalisasi skor ke rentang [0, 1] sepanjang sumbu terakhir (satu daftar skor, atau satu baris per kueri).
+    Daftar dengan skor konstan menjadi 0; masukan kosong menghasilkan array kosong.
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    if scores.size == 0:
+        return scores
+    min_score = scores.min(axis=-1, keepdims=True)
+    score_range = scores.max(axis=-1, keepdims=True) - min_score
+    return (scores - min_score) / np.where(score_range > 0, score_range, 1.0)
+
+def _top_k_rows(similarities: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Top-k per baris matriks skor (kueri x kasus): (indeks, skor), masing-masing berukuran (Q, k) dan terurut
+    menurun. np.partition mencari skor ke-k dalam O(N), lalu hanya kolom dengan skor setidaknya sebesar itu
+    yang diurutkan. Skor yang sama diurutkan berdasarkan indeks kolom (yang lebih kecil lebih dulu), termasuk
+    di batas ke-k, sehingga hasilnya deterministik meskipun banyak skor 0.0 yang sama (umum pada TF-IDF).
+    """
+    n_queries, n_cases = similarities.shape
+    k = min(top_k, n_cases)
+    if k <= 0:
+        return np.empty((n_queries, 0), dtype=np.intp), np.empty((n_queries, 0), dtype=similarities.dtype)
+    if k == n_cases:
+        order = np.argsort(-similarities, axis=1, kind="stable")
+        return order, np.take_along_axis(similarities, order, axis=1)
+
+    kth_scores = -np.partition(-similarities, k - 1, axis=1)[:, k - 1]
+    top_indices = np.empty((n_queries, k), dtype=np.intp)
+    for row, (row_scores, kth_score) in enumerate(zip(similarities, kth_scores)):
+        # flatnonzero menghasilkan indeks menaik, sehingga sort stabil memutus skor sama berdasarkan indeks
+        candidates = np.flatnonzero(row_scores >= kth_score)
+        top_indices[row] = candidates[np.argsort(-row_scores[candidates], kind="stable")[:k]]
+    return top_indices, np.take_along_axis(similarities, top_indices, axis=1)
+
+def _corpus_hash(case_texts: List[str]) -> str:
+    """Hash SHA-1 isi korpus kasus, dipakai sebagai kunci cache embedding dan IDF."""
+    return hashlib.sha1(b"\0".join(t.encode("utf-8") for t in case_texts)).hexdigest()
+
+def _load_indonesian_stopwords() -> List[str]:
+    """
+    Memuat stopword Bahasa Indonesia dari NLTK.
+    Pastikan Anda telah menjalankan `nltk.download('stopwords')`; jika tidak tersedia, gunakan daftar bawaan.
+    """
+    if stopwords is not None:
+        try:
+            return stopwords.words('indonesian')
+        except LookupError:
+            logger.warning("NLTK 'stopwords' not found. Please run nltk.download('stopwords'). Using built-in Indonesian stopwords for TF-IDF.")
+    return INDONESIAN_STOPWORDS_FALLBACK
+
+def _build_hashing_vectorizer() -> HashingVectorizer:
+    """HashingVectorizer tanpa vocabulary (O(token)); normalisasi dilakukan oleh TfidfTransformer."""
+    return HashingVectorizer(n_features=TFIDF_N_FEATURES, alternate_sign=False, norm=None,
+                             stop_words=_load_indonesian_stopwords(), ngram_range=TFIDF_NGRAM_RANGE)
+
+def _get_fitted_tfidf(hashing_vectorizer: HashingVectorizer, case_texts: List[str]) -> Tuple[TfidfTransformer, sparse.csr_matrix]:
+    """
+    Mengembalikan TfidfTransformer yang IDF-nya dihitung dari korpus kasus beserta matriks TF-IDF kasus (CSR).
+    Keduanya disimpan ke disk dengan kunci hash korpus sehingga selama korpus tidak berubah tidak ada fit
+    maupun transform kasus; per run hanya kueri yang di-transform.
+    """
+    # IDF juga bergantung pada stopword dan n-gram, jadi keduanya ikut masuk ke kunci cache
+    config_texts = [repr(hashing_vectorizer.ngram_range)] + sorted(hashing_vectorizer.stop_words)
+    cache_path = EMBEDDING_CACHE_DIR / f"tfidf_{TFIDF_N_FEATURES}_{_corpus_hash(case_texts + config_texts)}.npz"
+    tfidf_transformer = TfidfTransformer(sublinear_tf=True)
+
+    if cache_path.exists():
+        try:
+            with np.load(cache_path) as cached:
+                tfidf_transformer.idf_ = cached["idf"]
+                case_matrix = sparse.csr_matrix(
+                    (cached["data"], cached["indices"], cached["indptr"]), shape=tuple(cached["shape"])
+                )
+            if case_matrix.shape[0] == len(case_texts):
+                logger.info(f"Loaded cached TF-IDF weights and case matrix from '{cache_path}'.")
+                return tfidf_transformer, case_matrix
+            logger.warning(f"Cached TF-IDF matrix in '{cache_path}' does not match the corpus size. Refitting.")
+        except Exception as e:
+            logger.warning(f"Failed to read TF-IDF cache '{cache_path}': {e}. Refitting.")
+
+    case_counts = hashing_vectorizer.transform(case_texts)
+    case_matrix = tfidf_transformer.fit_transform(case_counts).tocsr()
+    try:
+        EMBEDDING_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        np.savez(cache_path, idf=tfidf_transformer.idf_, data=case_matrix.data, indices=case_matrix.indices,
+                 indptr=case_matrix.indptr, shape=np.array(case_matrix.shape))
+        logger.info(f"Saved TF-IDF weights and case matrix to '{cache_path}'.")
+    except OSError as e:
+        logger.warning(f"Failed to write TF-IDF cache '{cache_path}': {e}")
+    return tfidf_transformer, case_matrix
+
+def _embedding_cache_path(model_name: str, corpus_hash: str) -> Path:
+    """Path file cache embedding untuk kombinasi model dan isi korpus kasus tertentu."""
+    safe_model_name = model_name.replace("/", "_")
+    return EMBEDDING_CACHE_DIR / f"{safe_model_name}_{corpus_hash}.npz"
+
+def _encode_texts(texts: List[str]) -> np.ndarray:
+    """
+    Encode teks menjadi embedding float32 kontigu yang ternormalisasi L2. SentenceTransformer.encode
+    mengurutkan input berdasarkan panjang sebelum membentuk batch, sehingga padding per batch minimal.
+    Teks yang identik hanya di-encode sekali lalu embedding-nya disebar kembali ke setiap posisi.
+    """
+    unique_texts = list(dict.fromkeys(texts))
+    inverse = None
+    if len(unique_texts) < len(texts):
+        logger.info(f"Encoding {len(unique_texts)} unique texts out of {len(texts)} "
+                    f"({1 - len(unique_texts) / len(texts):.1%} duplicates skipped).")
+        position = {text: i for i, text in enumerate(unique_texts)}
+        inverse = np.fromiter((position[text] for text in texts), dtype=np.intp, count=len(texts))
+
+    autocast = torch.autocast('cuda', dtype=torch.float16) if BERT_DEVICE == 'cuda' else contextlib.nullcontext()
+    with torch.inference_mode(), autocast:
+        embeddings = BERT_MODEL.encode(unique_texts, batch_size=EMBEDDING_BATCH_SIZE, show_progress_bar=True,
+                                       convert_to_numpy=True, normalize_embeddings=True)
+    # Float32 kontigu (juga dari keluaran fp16 GPU) agar perkalian skor langsung memakai SGEMM tanpa salinan per pemanggilan
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+    return embeddings[inverse] if inverse is not None else embeddings
+
+def encode_cases_and_queries(case_texts: List[str], query_texts: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Mengembalikan embedding (ternormalisasi L2) untuk teks kasus dan kueri. Embedding kasus disimpan ke disk
+    dengan kunci hash isi korpus + nama model, sehingga korpus yang tidak berubah tidak perlu di-encode ulang
+    setiap kali dijalankan (termasuk pemanggilan kedua dari retrieve_by_hybrid); hanya kueri yang di-encode.
+    Jika cache belum ada, kasus dan kueri di-encode bersama dalam satu pemanggilan encode.
+    """
+    cache_path = _embedding_cache_path(BERT_MODEL_NAME, _corpus_hash(case_texts))
+
+    if cache_path.exists():
+        try:
+            with np.load(cache_path) as cached:
+                case_embeddings = np.ascontiguousarray(cached["emb"], dtype=np.float32)
+            if case_embeddings.shape[0] == len(case_texts):
+                logger.info(f"Loaded cached case embeddings from '{cache_path}'.")
+                return case_embeddings, _encode_texts(query_texts)
+            logger.warning(f"Cached embeddings in '{cache_path}' do not match the corpus size. Re-encoding.")
+        except Exception as e:
+            logger.warning(f"Failed to read embedding cache '{cache_path}': {e}. Re-encoding.")
+
+    # Satu pemanggilan untuk kasus + kueri: pengurutan panjang di dalam encode berlaku untuk gabungan keduanya
+    all_embeddings = _encode_texts(case_texts + query_texts)
+    case_embeddings = all_embeddings[:len(case_texts)]
+    query_embeddings = all_embeddings[len(case_texts):]
+    try:
+        EMBEDDING_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        np.savez(cache_path, emb=case_embeddings)
+        logger.info(f"Saved case embeddings to '{cache_path}'.")
+    except OSError as e:
+        logger.warning(f"Failed to write embedding cache '{cache_path}': {e}")
+    return case_embeddings, query_embeddings
 
 # --- Fungsi Retrieval Spesifik Metode ---
 
+def _tfidf_similarity_matrix(case_texts: List[str], query_texts: List[str]):
+    """Matriks kemiripan cosine TF-IDF (jumlah kueri, jumlah kasus) dalam format sparse CSR."""
+    hashing_vectorizer = _build_hashing_vectorizer()
+    tfidf_transformer, case_matrix = _get_fitted_tfidf(hashing_vectorizer, case_texts)
+
+    # Hanya kueri yang di-transform: tidak ada vocabulary yang dibangun ulang; IDF dan matriks kasus di-cache
+    query_matrix = tfidf_transformer.transform(hashing_vectorizer.transform(query_texts))
+
+    # TfidfTransformer (norm='l2') sudah menormalisasi setiap baris, sehingga cosine = perkalian matriks biasa.
+    # Hasil perkalian sparse x sparse tetap sparse (hanya pasangan kueri-kasus yang berbagi term).
+    return (query_matrix @ case_matrix.T).tocsr()
+
+def _tfidf_top_k(case_texts: List[str], query_texts: List[str], top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Top-k kasus per kueri berdasarkan kemiripan TF-IDF: (indeks, skor) berukuran (Q, k).
+    Matriks kemiripan sparse hanya didensifikasi per blok TFIDF_QUERY_BLOCK_SIZE kueri, bukan (Q, N) sekaligus.
+    """
+    similarities = _tfidf_similarity_matrix(case_texts, query_texts)
+    top_indices, top_scores = [], []
+    for block_start in range(0, similarities.shape[0], TFIDF_QUERY_BLOCK_SIZE):
+        block_indices, block_scores = _top_k_rows(
+            similarities[block_start:block_start + TFIDF_QUERY_BLOCK_SIZE].toarray(), top_k
+        )
+        top_indices.append(block_indices)
+        top_scores.append(block_scores)
+    return np.concatenate(top_indices, axis=0), np.concatenate(top_scores, axis=0)
+
+def _bert_top_k(case_texts: List[str], query_texts: List[str], top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Top-k kasus per kueri berdasarkan kemiripan Sentence-BERT: (indeks, skor) berukuran (Q, k).
+    Skor dihitung per blok SIMILARITY_BLOCK_SIZE kasus dan top-k digabung secara bertahap, sehingga
+    matriks kemiripan penuh (Q, N) tidak pernah dibuat untuk korpus besar.
+    """
+    case_embeddings, query_embeddings = encode_cases_and_queries(case_texts, query_texts)
+
+    best_indices = np.empty((len(query_texts), 0), dtype=np.intp)
+    best_scores = np.empty((len(query_texts), 0), dtype=np.float32)
+    for block_start in range(0, case_embeddings.shape[0], SIMILARITY_BLOCK_SIZE):
+        # Embedding kasus dan kueri sudah ternormalisasi L2 -> cosine = satu perkalian matriks float32 (GEMM)
+        block_scores = query_embeddings @ case_embeddings[block_start:block_start + SIMILARITY_BLOCK_SIZE].T
+        block_indices, block_scores = _top_k_rows(block_scores, top_k)
+
+        merged_indices = np.concatenate([best_indices, block_indices + block_start], axis=1)
+        merged_scores = np.concatenate([best_scores, block_scores], axis=1)
+        selected, best_scores = _top_k_rows(merged_scores, top_k)
+        best_indices = np.take_along_axis(merged_indices, selected, axis=1)
+    return best_indices, best_scores
+
+def _top_k_results(top_indices: np.ndarray, top_scores: np.ndarray, case_ids: List[str],
+                   query_ids: List[str]) -> Dict[str, Dict[str, List[Any]]]:
+    """Ubah indeks/skor top-k (Q, k) menjadi ID kasus dan skor ternormalisasi per kueri."""
+    # Normalisasi semua baris sekaligus, lalu tolist() mengubahnya menjadi float Python untuk JSON
+    normalized_scores = normalize_scores(top_scores).tolist()
+    results = {}
+    for i, q_id in enumerate(query_ids):
+        top_cases_ids = [case_ids[j] for j in top_indices[i]]
+        results[q_id] = {"case_ids": top_cases_ids, "scores": normalized_scores[i]}
+    return results
+
 def retrieve_by_tfidf(case_texts: List[str], query_texts: List[str], 
                       case_ids: List[str], query_ids: List[str], 
                       top_k: int = 5) -> Dict[str, Dict[str, List[Any]]]:
@@ -133,34 +411,7 @@ def retrieve_by_tfidf(case_texts: List[str], query_texts: List[str],
         logger.warning("No case or query texts for TF-IDF retrieval.")
         return {q_id: {"case_ids": [], "scores": []} for q_id in query_ids}
 
-    # Menggunakan stop words Bahasa Indonesia yang lebih baik
-    # Pastikan Anda telah menjalankan `nltk.download('stopwords')` jika menggunakan ini.
-    # try:
-    #     stop_words_list = stopwords.words('indonesian')
-    # except LookupError:
-    #     logger.warning("NLTK 'stopwords' not found. Please run nltk.download('stopwords'). Using default English stopwords for TF-IDF.")
-    #     stop_words_list = 'english'
-    
-    vectorizer = TfidfVectorizer(stop_words='english', max_features=5000) 
-    
-    corpus = case_texts + query_texts
-    tfidf_matrix = vectorizer.fit_transform(corpus)
-
-    case_matrix = tfidf_matrix[:len(case_texts)]
-    query_matrix = tfidf_matrix[len(case_texts):]
-
-    similarities = cosine_similarity(query_matrix, case_matrix)
-
-    results = {}
-    for i, sim_scores in enumerate(similarities):
-        top_indices = sim_scores.argsort()[::-1][:top_k]
-        
-        top_cases_ids = [case_ids[j] for j in top_indices]
-        similarity_scores = [float(sim_scores[j]) for j in top_indices] 
-        
-        normalized_scores = normalize_scores(similarity_scores)
-        
-        results[query_ids[i]] = {"case_ids": top_cases_ids, "scores": normalized_scores}
+    results = _top_k_results(*_tfidf_top_k(case_texts, query_texts, top_k), case_ids, query_ids)
     
     logger.info("TF-IDF retrieval complete.")
     return results
@@ -182,21 +433,7 @@ def retrieve_by_bert(case_texts: List[str], query_texts: List[str],
         return {q_id: {"case_ids": [], "scores": []} for q_id in query_ids}
 
     try:
-        case_embeddings = BERT_MODEL.encode(case_texts, show_progress_bar=True, convert_to_tensor=True).cpu().numpy()
-        query_embeddings = BERT_MODEL.encode(query_texts, show_progress_bar=True, convert_to_tensor=True).cpu().numpy()
-
-        similarities = cosine_similarity(query_embeddings, case_embeddings)
-
-        results = {}
-        for i, sim_scores in enumerate(similarities):
-            top_indices = sim_scores.argsort()[::-1][:top_k]
-            
-            top_cases_ids = [case_ids[j] for j in top_indices]
-            similarity_scores = [float(sim_scores[j]) for j in top_indices]
-            
-            normalized_scores = normalize_scores(similarity_scores)
-            
-            results[query_ids[i]] = {"case_ids": top_cases_ids, "scores": normalized_scores}
+        results = _top_k_results(*_bert_top_k(case_texts, query_texts, top_k), case_ids, query_ids)
         
         logger.info("BERT retrieval complete.")
         return results
@@ -205,38 +442,73 @@ def retrieve_by_bert(case_texts: List[str], query_texts: List[str],
         return {q_id: {"case_ids": [], "scores": []} for q_id in query_ids}
 
 
+def _rerank_with_cross_encoder(query_text: str, case_texts: List[str],
+                               candidates: List[Tuple[int, float]]) -> List[Tuple[int, float]]:
+    """
+    Menilai ulang pasangan (kueri, kasus) kandidat dengan cross-encoder dan mengurutkannya berdasarkan skor baru.
+    Hanya kandidat (maksimal TOP_K_RERANK) yang diproses, bukan seluruh korpus.
+    Skor yang dikembalikan tetap skor kandidat semula (RRF, dalam [0, 1]): logit cross-encoder tidak terbatas
+    dan bisa negatif, sehingga tidak cocok dipakai sebagai bobot voting di 04_predict.py.
+    """
+    pairs = [(query_text, case_texts[case_idx]) for case_idx, _ in candidates]
+    rerank_scores = CROSS_ENCODER_MODEL.predict(pairs, batch_size=CROSS_ENCODER_BATCH_SIZE, show_progress_bar=False)
+    order = np.argsort(-np.asarray(rerank_scores, dtype=np.float64), kind="stable")
+    return [candidates[j] for j in order.tolist()]
+
 def retrieve_by_hybrid(case_texts: List[str], query_texts: List[str], 
                        case_ids: List[str], query_ids: List[str], 
                        top_k: int = 5) -> Dict[str, Dict[str, List[Any]]]:
     """
     Melakukan retrieval menggunakan metode Hybrid (TF-IDF + BERT), mengembalikan ID kasus dan skor kemiripan.
-    Ini menggunakan Weighted Sum of Scores.
+    Ini menggunakan Reciprocal Rank Fusion (RRF): skor(d) = sum 1 / (RRF_K + rank(d)) atas top-2K setiap
+    metode. Hanya peringkat yang dipakai, sehingga skala skor kedua metode tidak perlu dinormalisasi.
+    Skor RRF dibagi dengan nilai maksimum yang mungkin (jumlah metode / RRF_K) sehingga berada di [0, 1],
+    skala yang sama dengan skor kemiripan TF-IDF/BERT yang dipakai PREDICTION_SCORE_THRESHOLD di 04_predict.py.
+    Jika USE_CROSS_ENCODER_RERANK aktif, TOP_K_RERANK kandidat RRF teratas diurutkan ulang dengan cross-encoder.
     """
-    logger.info("Performing Hybrid retrieval (TF-IDF + BERT)...")
-
-    # Dapatkan hasil dari TF-IDF dan BERT terlebih dahulu
-    tfidf_results = retrieve_by_tfidf(case_texts, query_texts, case_ids, query_ids, top_k * 2) 
-    bert_results = retrieve_by_bert(case_texts, query_texts, case_ids, query_ids, top_k * 2)
-
-    hybrid_results = {}
+    logger.info("Performing Hybrid retrieval (TF-IDF + BERT, RRF)...")
 
-    for q_id in query_ids:
-        combined_scores: Dict[str, float] = {}
+    if not case_texts or not query_texts:
+        logger.warning("No case or query texts for Hybrid retrieval.")
+        return {q_id: {"case_ids": [], "scores": []} for q_id in query_ids}
 
-        for idx, case_id in enumerate(tfidf_results.get(q_id, {}).get("case_ids", [])):
-            score = tfidf_results[q_id]["scores"][idx]
-            combined_scores[case_id] = combined_scores.get(case_id, 0.0) + (score * 0.5) 
+    rerank = CROSS_ENCODER_MODEL is not None
+    num_candidates = max(top_k, TOP_K_RERANK) if rerank else top_k
+    per_method_depth = max(top_k * 2, num_candidates)
 
-        for idx, case_id in enumerate(bert_results.get(q_id, {}).get("case_ids", [])):
-            score = bert_results[q_id]["scores"][idx]
-            combined_scores[case_id] = combined_scores.get(case_id, 0.0) + (score * 0.5) 
-        
-        sorted_cases = sorted(combined_scores.items(), key=lambda item: item[1], reverse=True)
-        
-        top_cases_ids = [case_id for case_id, score in sorted_cases[:top_k]]
-        similarity_scores = [score for case_id, score in sorted_cases[:top_k]]
-        
-        hybrid_results[q_id] = {"case_ids": top_cases_ids, "scores": similarity_scores}
+    # Peringkat (indeks kasus per kueri) dari setiap metode; RRF hanya membutuhkan urutan, bukan skor.
+    # Kandidat TF-IDF dengan kemiripan <= 0 tidak punya kecocokan leksikal dan tidak diberi kredit peringkat.
+    tfidf_indices, tfidf_scores = _tfidf_top_k(case_texts, query_texts, per_method_depth)
+    ranked_indices = [[row_indices[row_scores > 0] for row_indices, row_scores in zip(tfidf_indices, tfidf_scores)]]
+    if BERT_MODEL is None:
+        logger.error("BERT model not loaded. Hybrid retrieval uses TF-IDF ranks only.")
+    else:
+        try:
+            ranked_indices.append(_bert_top_k(case_texts, query_texts, per_method_depth)[0])
+        except Exception as e:
+            logger.error(f"Error during BERT scoring for Hybrid retrieval: {e}. Using TF-IDF ranks only.")
+
+    # Kasus di peringkat pertama semua metode mendapat skor 1.0
+    rrf_scale = RRF_K / len(ranked_indices)
+    hybrid_results = {}
+    for i, q_id in enumerate(query_ids):
+        rrf_scores: Dict[int, float] = defaultdict(float)
+        for method_ranking in ranked_indices:
+            for rank, case_idx in enumerate(method_ranking[i].tolist()):
+                rrf_scores[case_idx] += rrf_scale / (RRF_K + rank)
+
+        top_cases = heapq.nlargest(num_candidates, rrf_scores.items(), key=itemgetter(1))
+        if rerank:
+            try:
+                top_cases = _rerank_with_cross_encoder(query_texts[i], case_texts, top_cases)
+            except Exception as e:
+                logger.error(f"Error during cross-encoder reranking for query {q_id}: {e}. Keeping RRF order.")
+        top_cases = top_cases[:top_k]
+
+        hybrid_results[q_id] = {
+            "case_ids": [case_ids[case_idx] for case_idx, _ in top_cases],
+            "scores": [score for _, score in top_cases]
+        }
 
     logger.info("Hybrid retrieval complete.")
     return hybrid_results
@@ -251,7 +523,7 @@ def main():
         return
 
     # Muat data kasus
-    cases = load_json_data(CASE_BASE_PATH)
+    cases = load_case_data(CASE_RETRIEVAL_COLUMNS)
     if cases is None:
         logger.error("Failed to load case base data. Exiting.")
         return
@@ -269,32 +541,39 @@ def main():
         logger.warning("No queries found. Retrieval cannot proceed.")
         return
 
-    # Ekstrak teks dan ID yang relevan dari kasus dan kueri
-    case_ids = []
-    case_texts = []
-    for i, case in enumerate(cases):
-        if not isinstance(case, dict):
-            logger.warning(f"Skipping case at index {i}: not a dictionary.")
-            continue
-        extracted_text = extract_case_text_for_retrieval(case)
-        if extracted_text:
-            case_ids.append(case.get("case_id", f"case_{i}"))
-            case_texts.append(extracted_text)
-        else:
-            logger.warning(f"Skipping case {case.get('case_id', f'case_{i}')} due to no suitable text content.")
-
-    query_ids = []
-    query_texts = []
-    for i, query in enumerate(queries):
-        if not isinstance(query, dict):
-            logger.warning(f"Skipping query at index {i}: not a dictionary.")
-            continue
-        query_text = query.get("text")
-        if query_text and isinstance(query_text, str) and query_text.strip():
-            query_ids.append(query.get("query_id", f"query_{i}"))
-            query_texts.append(query_text.strip())
-        else:
-            logger.warning(f"Skipping query {query.get('query_id', f'query_{i}')} due to missing or empty 'text' field.")
+    # Ekstrak teks dan ID yang relevan dari kasus dan kueri dalam satu comprehension per daftar.
+    # Entri yang dilewati hanya dicatat (loop terpisah) jika memang ada yang dilewati.
+    case_entries = [
+        (i, case.get("case_id", f"case_{i}"), text) for i, case in enumerate(cases)
+        if isinstance(case, dict) and (text := extract_case_text_for_retrieval(case))
+    ]
+    case_ids = [case_id for _, case_id, _ in case_entries]
+    case_texts = [text for _, _, text in case_entries]
+    if len(case_entries) < len(cases):
+        kept_case_indices = {i for i, _, _ in case_entries}
+        for i, case in enumerate(cases):
+            if i in kept_case_indices:
+                continue
+            if not isinstance(case, dict):
+                logger.warning(f"Skipping case at index {i}: not a dictionary.")
+            else:
+                logger.warning(f"Skipping case {case.get('case_id', f'case_{i}')} due to no suitable text content.")
+
+    query_entries = [
+        (i, query.get("query_id", f"query_{i}"), query_text.strip()) for i, query in enumerate(queries)
+        if isinstance(query, dict) and isinstance(query_text := query.get("text"), str) and query_text.strip()
+    ]
+    query_ids = [query_id for _, query_id, _ in query_entries]
+    query_texts = [text for _, _, text in query_entries]
+    if len(query_entries) < len(queries):
+        kept_query_indices = {i for i, _, _ in query_entries}
+        for i, query in enumerate(queries):
+            if i in kept_query_indices:
+                continue
+            if not isinstance(query, dict):
+                logger.warning(f"Skipping query at index {i}: not a dictionary.")
+            else:
+                logger.warning(f"Skipping query {query.get('query_id', f'query_{i}')} due to missing or empty 'text' field.")
 
     if not case_texts:
         logger.error("No valid case texts extracted for retrieval. Cannot proceed.")
@@ -337,6 +616,7 @@ def main():
 
     # Simpan hasil
     try:
+        # Ditulis dengan modul json bawaan: orjson hanya mendukung indentasi 2 spasi, sedangkan format file ini 4 spasi
         with open(OUTPUT_PATH, "w", encoding="utf-8") as f:
             json.dump(final_retrieval_results, f, indent=4, ensure_ascii=False)
         logger.info(f"✅ Retrieval completed. Results for all methods saved to '{OUTPUT_PATH}'")
@@ -3,20 +3,35 @@ import json
 import csv
 import re
 from pathlib import Path
-from collections import Counter
+from collections import Counter, defaultdict
+from heapq import nlargest
+from operator import itemgetter
 from typing import List, Dict, Any, Optional, Tuple
 import logging
+# orjson (opsional) jauh lebih cepat untuk memuat/menulis file JSON besar; fallback ke modul json bawaan
+try:
+    import orjson
+except ImportError:
+    orjson = None
+# pandas (opsional) untuk membaca cache parquet kasus yang ditulis 02_case_representation.py
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
 
 # --- Konfigurasi Awal ---
 RETRIEVAL_FILE = Path("data/results/retrieved_cases.json")
 CASE_FILE = Path("data/processed/cases.json")
+CASE_PARQUET_PATH = Path("data/processed/cases.parquet")
 OUTPUT_PREDICTIONS_DIR = Path("data/results/") 
 PREDICTION_FILE_NAME_FORMAT = "predictions_{method_name}.csv" # Pola nama file
+CSV_WRITE_BUFFER_SIZE = 1 << 20 # Buffer tulis file prediksi (1 MiB)
 
 # Konfigurasi Thresholding (Parameter yang bisa diatur)
 # Jika True, prediksi akan berdasarkan threshold. Jika False, akan mengambil top_N_PREDICTED_PASALS.
 USE_PREDICTION_THRESHOLD = False
 # Ambang batas skor minimal untuk sebuah pasal agar diprediksi (untuk USE_PREDICTION_THRESHOLD = True)
+# Skor kasus semua metode berada di [0, 1] (skor RRF Hybrid dinormalisasi di 03_retrieval.py), skor pasal = jumlahnya
 PREDICTION_SCORE_THRESHOLD = 0.5 
 # Jika USE_PREDICTION_THRESHOLD = False, ambil N pasal dengan skor tertinggi
 TOP_N_PREDICTED_PASALS = 10
@@ -25,6 +40,12 @@ TOP_N_PREDICTED_PASALS = 10
 logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
 logger = logging.getLogger(__name__)
 
+# --- Pola Regex (dikompilasi sekali saat modul dimuat, sama seperti 02_case_representation.py) ---
+_RE_PASAL = re.compile(r"Pasal\s+\d+(?:\s+Ayat\s*\(\d+\))?(?:\s+huruf\s+[a-zA-Z])?", re.IGNORECASE)
+_RE_WS_RUN = re.compile(r'\s+')
+_RE_AYAT = re.compile(r'Ayat\s*\(\s*(\d+)\s*\)', re.IGNORECASE)
+_RE_HURUF = re.compile(r'huruf\s*([a-zA-Z])', re.IGNORECASE)
+
 # --- Fungsi Utilitas ---
 def initialize_directories(file_path: Path) -> bool:
     try:
@@ -41,8 +62,12 @@ def load_json_data(file_path: Path) -> Optional[List[Dict[str, Any]]]:
         return None
 
     try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
+        if orjson is not None:
+            with open(file_path, "rb") as f:
+                data = orjson.loads(f.read())
+        else:
+            with open(file_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
             
         if not isinstance(data, list):
             logger.error(f"Invalid data format in '{file_path}'. Expected a JSON array, got {type(data).__name__}.")
@@ -65,68 +90,73 @@ def load_json_data(file_path: Path) -> Optional[List[Dict[str, Any]]]:
         logger.error(f"Unexpected error reading '{file_path}': {e}")
         return None
 
+def load_case_data(columns: List[str]) -> Optional[List[Dict[str, Any]]]:
+    """
+    Memuat data kasus. Jika cache parquet dari 02_case_representation.py tersedia dan tidak lebih lama dari
+    cases.json, hanya kolom yang dibutuhkan yang dibaca dari parquet; selain itu kembali ke JSON.
+    """
+    if pd is not None and CASE_PARQUET_PATH.exists() and (
+        not CASE_FILE.exists() or CASE_PARQUET_PATH.stat().st_mtime >= CASE_FILE.stat().st_mtime
+    ):
+        try:
+            df = pd.read_parquet(CASE_PARQUET_PATH, columns=columns)
+            # Nilai kosong (NaN/None) dikembalikan sebagai None, sama seperti field yang tidak ada di JSON
+            records = df.astype(object).where(df.notna(), None).to_dict("records")
+            logger.info(f"Successfully loaded {len(records)} entries from '{CASE_PARQUET_PATH}'.")
+            return records
+        except Exception as e:
+            logger.warning(f"Failed to read parquet case cache '{CASE_PARQUET_PATH}': {e}. Falling back to JSON.")
+    return load_json_data(CASE_FILE)
+
 def extract_pasals(text: Optional[str]) -> List[str]:
     """
     Mengekstrak semua referensi pasal dari sebuah string teks menggunakan ekspresi reguler.
     Fungsi ini harus konsisten dengan `02_case_representation.py` dan `05_evaluation.py`.
     """
-    pasal_pattern = re.compile(
-        r"Pasal\s+\d+(?:\s+Ayat\s*\(\d+\))?(?:\s+huruf\s+[a-zA-Z])?",
-        re.IGNORECASE
-    )
-    pasals = pasal_pattern.findall(text or "")
+    pasals = _RE_PASAL.findall(text or "")
     pasals_cleaned = []
     for p in pasals:
-        p = re.sub(r'\s+', ' ', p).strip()
-        p = re.sub(r'Ayat\s*\(\s*(\d+)\s*\)', r'Ayat (\1)', p, re.IGNORECASE)
-        p = re.sub(r'huruf\s*([a-zA-Z])', r'huruf \1', p, re.IGNORECASE)
+        p = _RE_WS_RUN.sub(' ', p).strip()
+        p = _RE_AYAT.sub(r'Ayat (\1)', p)
+        p = _RE_HURUF.sub(r'huruf \1', p)
         pasals_cleaned.append(p.title())
     return list(dict.fromkeys(pasals_cleaned))
 
-def weighted_majority_vote(cases_with_scores: List[Tuple[Dict[str, Any], float]]) -> str:
+def weighted_majority_vote(pasals_with_scores: List[Tuple[List[str], float]]) -> str:
     """
     Melakukan 'majority vote' berbobot untuk menentukan solusi yang diprediksi 
     berdasarkan pasal-pasal dan skor kemiripan dari kasus-kasus yang relevan.
     
     Args:
-        cases_with_scores (List[Tuple[Dict[str, Any], float]]): Daftar tuple, 
-            di mana setiap tuple berisi (objek kasus, skor kemiripan kasus tersebut).
+        pasals_with_scores (List[Tuple[List[str], float]]): Daftar tuple, 
+            di mana setiap tuple berisi (daftar pasal kasus hasil extract_pasals, skor kemiripan kasus tersebut).
             
     Returns:
         str: String yang berisi pasal-pasal yang diprediksi, dipisahkan dengan "; ".
              Mengembalikan "N/A" jika tidak ada pasal yang dapat ditemukan.
     """
-    pasal_weighted_scores: Dict[str, float] = {}
+    pasal_weighted_scores: Dict[str, float] = defaultdict(float)
     
-    for case, score in cases_with_scores:
-        if not isinstance(case, dict):
-            logger.warning(f"Skipping non-dictionary case in weighted majority vote: {case}")
-            continue
-        
-        # Ekstrak pasal dari bidang 'pasal' setiap kasus
-        pasals = extract_pasals(case.get("pasal", ""))
-        
+    for pasals, score in pasals_with_scores:
         # Tambahkan skor kasus ke setiap pasal yang ditemukan
         for pasal in pasals:
-            pasal_weighted_scores[pasal] = pasal_weighted_scores.get(pasal, 0.0) + score
+            pasal_weighted_scores[pasal] += score
     
     # Jika tidak ada pasal yang ditemukan sama sekali dari semua kasus
     if not pasal_weighted_scores:
         return "N/A" 
         
-    # Urutkan pasal berdasarkan skor bobotnya secara menurun
-    sorted_pasals = sorted(pasal_weighted_scores.items(), key=lambda item: item[1], reverse=True)
-    
     predicted_pasals_final = []
 
     if USE_PREDICTION_THRESHOLD:
-        # Ambil pasal yang skor bobotnya melebihi ambang batas
+        # Ambil pasal yang skor bobotnya melebihi ambang batas, diurutkan berdasarkan skor secara menurun
+        sorted_pasals = sorted(pasal_weighted_scores.items(), key=itemgetter(1), reverse=True)
         for pasal, score in sorted_pasals:
             if score >= PREDICTION_SCORE_THRESHOLD:
                 predicted_pasals_final.append(pasal)
     else:
-        # Ambil TOP_N_PREDICTED_PASALS pasal teratas
-        for pasal, score in sorted_pasals[:TOP_N_PREDICTED_PASALS]:
+        # Ambil TOP_N_PREDICTED_PASALS pasal teratas tanpa mengurutkan seluruh pasal
+        for pasal, score in nlargest(TOP_N_PREDICTED_PASALS, pasal_weighted_scores.items(), key=itemgetter(1)):
             predicted_pasals_final.append(pasal)
     
     # Jika setelah filter tidak ada pasal yang tersisa, kembalikan "N/A"
@@ -155,7 +185,7 @@ def main():
         logger.warning("No retrieval data found. Nothing to predict.")
         return
 
-    case_data = load_json_data(CASE_FILE)
+    case_data = load_case_data(["case_id", "pasal"])
     if case_data is None:
         logger.error("Failed to load case base data. Exiting.")
         return
@@ -163,9 +193,13 @@ def main():
         logger.warning("No case base data found. Cannot perform weighted voting.")
         return
 
-    # Buat kamus untuk pencarian kasus yang efisien berdasarkan case_id.
-    case_dict = {str(c.get("case_id")): c for c in case_data if c.get("case_id")}
-    if not case_dict:
+    # Voting hanya membutuhkan pasal setiap kasus: simpan case_id -> daftar pasal (diekstrak sekali di sini,
+    # bukan setiap kali kasus muncul di hasil query/metode) lalu lepaskan objek kasus lengkapnya.
+    case_pasals: Dict[str, List[str]] = {
+        str(c.get("case_id")): extract_pasals(c.get("pasal", "")) for c in case_data if c.get("case_id")
+    }
+    del case_data
+    if not case_pasals:
         logger.error("No valid case_ids found in case base. Cannot map retrieved cases.")
         return
 
@@ -205,10 +239,11 @@ def main():
                 logger.warning(f"Skipping query {query_id} for method '{method_name}': Invalid retrieval_results structure. Skipping.")
                 continue
             
-            cases_for_weighted_vote: List[Tuple[Dict[str, Any], float]] = []
+            cases_for_weighted_vote: List[Tuple[List[str], float]] = []
             for i, cid in enumerate(top_case_ids_for_method):
-                if cid in case_dict:
-                    cases_for_weighted_vote.append((case_dict[cid], similarity_scores_for_method[i]))
+                pasals = case_pasals.get(cid)
+                if pasals is not None:
+                    cases_for_weighted_vote.append((pasals, similarity_scores_for_method[i]))
                 else:
                     logger.warning(f"Case ID '{cid}' for query '{query_id}' and method '{method_name}' not found in case base. Skipping this case for voting.")
 
@@ -232,20 +267,22 @@ def main():
         output_file_path = OUTPUT_PREDICTIONS_DIR / PREDICTION_FILE_NAME_FORMAT.format(method_name=method_name.replace(" ", "_").replace("-", "_"))
         
         try:
-            with open(output_file_path, "w", newline="", encoding="utf-8") as f:
+            # Semua baris disiapkan dulu lalu ditulis sekaligus dengan writerows melalui buffer besar
+            rows = [
+                (
+                    r.get("query_id", ""),
+                    r.get("predicted_solution", ""),
+                    # Pastikan list top_retrieved_case_ids_for_method dikonversi ke string
+                    ", ".join(map(str, r.get("top_retrieved_case_ids_for_method", [])))
+                )
+                for r in predictions_for_method
+            ]
+            with open(output_file_path, "w", newline="", encoding="utf-8", buffering=CSV_WRITE_BUFFER_SIZE) as f:
                 writer = csv.writer(f, quoting=csv.QUOTE_ALL)
                 
                 # Header kolom harus disesuaikan dengan field yang disimpan
                 writer.writerow(["query_id", "predicted_solution", "top_retrieved_case_ids_for_method"])
-                
-                for r in predictions_for_method:
-                    # Pastikan list top_retrieved_case_ids_for_method dikonversi ke string
-                    top_ids_str = ", ".join(map(str, r.get("top_retrieved_case_ids_for_method", [])))
-                    writer.writerow([
-                        r.get("query_id", ""),
-                        r.get("predicted_solution", ""),
-                        top_ids_str
-                    ])
+                writer.writerows(rows)
 
             logger.info(f"✅ Prediksi untuk metode '{method_name}' berhasil disimpan ke: '{output_file_path}'")
         except Exception as e:
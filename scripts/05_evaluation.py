@@ -1,12 +1,22 @@
 import json
 import csv
+import os
 import re
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+from itertools import repeat
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 import logging
 import pandas as pd
 import numpy as np
 from collections import Counter
+# orjson (opsional) jauh lebih cepat untuk memuat/menulis file JSON besar; fallback ke modul json bawaan
+try:
+    import orjson
+except ImportError:
+    orjson = None
 import warnings
 warnings.filterwarnings("ignore", category=DeprecationWarning)
 warnings.filterwarnings("ignore", category=FutureWarning)
@@ -17,14 +27,27 @@ CASE_FILE = Path("data/processed/cases.json")
 RETRIEVED_CASES_FILE = Path("data/results/retrieved_cases.json") # Hasil retrieval dari berbagai metode
 PREDICTIONS_DIR = Path("data/results/") 
 PREDICTION_FILE_PATTERN = "predictions_{method_name}.csv" # Pola nama file prediksi
+# Nama metode diambil dari nama file prediksi; 04_predict.py mengganti spasi dan '-' dengan '_'
+PREDICTION_FILE_RE = re.compile(r"predictions_(.+)\.csv")
+METHOD_DISPLAY_NAMES = {"TF IDF": "TF-IDF"} # Normalisasi nama metode untuk display
+# Kolom file prediksi dibaca langsung sebagai string (tanpa inferensi tipe)
+PREDICTION_CSV_DTYPES = {"query_id": "string", "predicted_solution": "string"}
 
 RETRIEVAL_METRICS_FILE = Path("data/eval/retrieval_metrics.csv")
+RETRIEVAL_K = 5 # K untuk Precision@K, Recall@K, dan F1-Score@K
+RETRIEVAL_METRIC_NAMES = [f"Precision@{RETRIEVAL_K}", f"Recall@{RETRIEVAL_K}", f"F1-Score@{RETRIEVAL_K}", "MAP", "MRR"]
 PREDICTION_METRICS_FILE = Path("data/eval/prediction_metrics.csv")
 
 # Mengatur logging untuk memberikan informasi, peringatan, dan kesalahan selama eksekusi.
 logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
 logger = logging.getLogger(__name__)
 
+# --- Pola Regex (dikompilasi sekali saat modul dimuat, sama seperti 04_predict.py) ---
+_RE_PASAL = re.compile(r"Pasal\s+\d+(?:\s+Ayat\s*\(\d+\))?(?:\s+huruf\s+[a-zA-Z])?", re.IGNORECASE)
+_RE_WS_RUN = re.compile(r'\s+')
+_RE_AYAT = re.compile(r'Ayat\s*\(\s*(\d+)\s*\)', re.IGNORECASE)
+_RE_HURUF = re.compile(r'huruf\s*([a-zA-Z])', re.IGNORECASE)
+
 # --- Fungsi Utilitas ---
 
 def initialize_directories(file_path: Path) -> bool:
@@ -51,8 +74,12 @@ def load_json_data(file_path: Path) -> Optional[List[Dict[str, Any]]]:
         return None
 
     try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
+        if orjson is not None:
+            with open(file_path, "rb") as f:
+                data = orjson.loads(f.read())
+        else:
+            with open(file_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
             
         if not isinstance(data, list):
             logger.error(f"Invalid data format in '{file_path}'. Expected a JSON array, got {type(data).__name__}.")
@@ -75,6 +102,27 @@ def load_json_data(file_path: Path) -> Optional[List[Dict[str, Any]]]:
         logger.error(f"Unexpected error reading '{file_path}': {e}")
         return None
 
+def read_prediction_csv(file_path: Path) -> pd.DataFrame:
+    """
+    Membaca file prediksi dengan engine pyarrow (parsing multi-thread) bila tersedia,
+    dan kembali ke engine C bawaan pandas jika pyarrow tidak terpasang atau gagal mem-parse file.
+    """
+    try:
+        return pd.read_csv(file_path, engine="pyarrow", dtype=PREDICTION_CSV_DTYPES)
+    except (ImportError, ValueError) as e:
+        logger.debug(f"PyArrow CSV reader unavailable for '{file_path}' ({e}); using the default engine.")
+        return pd.read_csv(file_path, dtype=PREDICTION_CSV_DTYPES)
+
+def load_evaluation_inputs() -> Tuple[Optional[List[Dict[str, Any]]], Optional[List[Dict[str, Any]]], Optional[List[Dict[str, Any]]]]:
+    """
+    Memuat queries.json, cases.json, dan retrieved_cases.json secara bersamaan di thread terpisah
+    sehingga pembacaan disk satu file tumpang tindih dengan parsing file lainnya.
+    Mengembalikan (queries, cases, retrieved_cases).
+    """
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        queries, cases, retrieved_cases = executor.map(load_json_data, [QUERY_FILE, CASE_FILE, RETRIEVED_CASES_FILE])
+    return queries, cases, retrieved_cases
+
 def extract_pasals(text: Optional[str]) -> List[str]:
     """
     Mengekstrak semua referensi pasal dari sebuah string teks menggunakan ekspresi reguler.
@@ -82,93 +130,100 @@ def extract_pasals(text: Optional[str]) -> List[str]:
     """
     if not text or text == "N/A": # Tambahan untuk menangani "N/A" dari prediksi
         return []
-        
-    pasal_pattern = re.compile(
-        r"Pasal\s+\d+(?:\s+Ayat\s*\(\d+\))?(?:\s+huruf\s+[a-zA-Z])?",
-        re.IGNORECASE
-    )
-    pasals = pasal_pattern.findall(text) # Menggunakan 'text' langsung
-    
+
+    pasals = _RE_PASAL.findall(text)
     pasals_cleaned = []
     for p in pasals:
-        p = re.sub(r'\s+', ' ', p).strip()
-        re.sub(r'Ayat\s*\(\s*(\d+)\s*\)', r'Ayat (\1)', p, flags=re.IGNORECASE)
-        p = re.sub(r'huruf\s*([a-zA-Z])', r'huruf \1', p, re.IGNORECASE)
+        p = _RE_WS_RUN.sub(' ', p).strip()
+        p = _RE_AYAT.sub(r'Ayat (\1)', p)
+        p = _RE_HURUF.sub(r'huruf \1', p)
         pasals_cleaned.append(p.title())
     return list(dict.fromkeys(pasals_cleaned)) # Pastikan unik
 
-# --- Fungsi Metrik Retrieval ---
-
-def calculate_precision_at_k(retrieved_ids: List[str], relevant_ids: List[str], k: int = 5) -> float:
-    """Hitung Precision@K"""
-    if not retrieved_ids:
-        return 0.0
-    
-    retrieved_k = retrieved_ids[:k]
-    relevant_set = set(relevant_ids)
-    retrieved_set = set(retrieved_k)
-    
-    if len(retrieved_k) == 0:
-        return 0.0
-    
-    return len(retrieved_set.intersection(relevant_set)) / len(retrieved_k)
-
-def calculate_recall_at_k(retrieved_ids: List[str], relevant_ids: List[str], k: int = 5) -> float:
-    """Hitung Recall@K"""
-    if not relevant_ids:
-        return 0.0
-    
-    retrieved_k = retrieved_ids[:k]
-    relevant_set = set(relevant_ids)
-    retrieved_set = set(retrieved_k)
-    
-    return len(retrieved_set.intersection(relevant_set)) / len(relevant_set)
+@lru_cache(maxsize=None)
+def extract_pasal_set(text: Optional[str]) -> frozenset:
+    """
+    Versi extract_pasals yang mengembalikan frozenset dan di-cache, karena string pasal yang sama
+    (ground truth maupun prediksi) muncul berulang kali di seluruh metode.
+    """
+    return frozenset(extract_pasals(text))
 
-def calculate_f1_at_k(retrieved_ids: List[str], relevant_ids: List[str], k: int = 5) -> float:
-    """Hitung F1-Score@K"""
-    precision = calculate_precision_at_k(retrieved_ids, relevant_ids, k)
-    recall = calculate_recall_at_k(retrieved_ids, relevant_ids, k)
-    
-    if precision + recall == 0:
-        return 0.0
-    
-    return 2 * (precision * recall) / (precision + recall)
+# --- Fungsi Metrik Retrieval ---
 
-def calculate_average_precision(retrieved_ids: List[str], relevant_ids: List[str]) -> float:
-    """Hitung Average Precision untuk satu query"""
-    if not relevant_ids:
-        return 0.0
-    
-    relevant_set = set(relevant_ids)
-    precisions = []
-    relevant_found = 0
-    
-    for i, doc_id in enumerate(retrieved_ids):
-        if doc_id in relevant_set:
-            relevant_found += 1
-            precision_at_i = relevant_found / (i + 1)
-            precisions.append(precision_at_i)
-    
-    if not precisions:
-        return 0.0
-    
-    return sum(precisions) / len(relevant_ids)
+def encode_id_matrix(id_lists: List[List[Any]], id2int: Dict[str, int]) -> np.ndarray:
+    """
+    Ubah daftar case_id per query menjadi matriks int32 (n_query x panjang maksimum) dengan padding -1.
+    case_id baru ditambahkan ke `id2int`, sehingga pemetaan yang sama dapat dipakai untuk semua metode.
+    """
+    width = max(max((len(ids) for ids in id_lists), default=0), 1)
+    matrix = np.full((len(id_lists), width), -1, dtype=np.int32)
+    for row, ids in enumerate(id_lists):
+        if ids:
+            matrix[row, :len(ids)] = [id2int.setdefault(str(cid), len(id2int)) for cid in ids]
+    return matrix
+
+def compute_all_metrics(retrieved_matrix: np.ndarray, relevant_matrix: np.ndarray, k: int = 5) -> Dict[str, np.ndarray]:
+    """
+    Hitung Precision@K, Recall@K, F1-Score@K, AP, dan RR untuk semua query sekaligus.
+    Kedua input adalah matriks id integer dari encode_id_matrix (padding -1). Relevansi setiap dokumen disusun
+    sebagai matriks boolean lewat perbandingan integer, lalu seluruh metrik diturunkan dari jumlah kumulatif
+    per baris sehingga tidak ada loop Python per query maupun per metrik.
+    Mengembalikan dictionary {nama_metrik: array nilai per query}.
+    """
+    n_queries, max_len = retrieved_matrix.shape
+    retrieved_mask = retrieved_matrix >= 0
+    lengths = retrieved_mask.sum(axis=1)
+    n_relevant = (relevant_matrix >= 0).sum(axis=1).astype(np.float64)
+
+    # hits[q, i] = dokumen ke-i milik query q termasuk dokumen relevan query q (padding tidak pernah cocok)
+    hits = (retrieved_matrix[:, :, None] == relevant_matrix[:, None, :]).any(axis=2) & retrieved_mask
+
+    # Precision@K dibagi jumlah dokumen yang benar-benar di-retrieve (maksimal K), Recall@K dibagi jumlah dokumen relevan
+    hits_at_k = hits[:, :k].sum(axis=1, dtype=np.float64)
+    retrieved_at_k = np.minimum(lengths, k).astype(np.float64)
+    precision = np.divide(hits_at_k, retrieved_at_k, out=np.zeros(n_queries), where=retrieved_at_k > 0)
+    recall = np.divide(hits_at_k, n_relevant, out=np.zeros(n_queries), where=n_relevant > 0)
+    pr_sum = precision + recall
+    f1 = np.divide(2 * precision * recall, pr_sum, out=np.zeros(n_queries), where=pr_sum > 0)
+
+    # AP: rata-rata precision@i pada posisi dokumen relevan, dinormalisasi dengan jumlah dokumen relevan
+    precision_at_i = hits.cumsum(axis=1) / np.arange(1, max_len + 1)
+    ap = np.divide((precision_at_i * hits).sum(axis=1), n_relevant, out=np.zeros(n_queries), where=n_relevant > 0)
+
+    # RR: kebalikan peringkat dokumen relevan pertama (0 jika tidak ada yang relevan)
+    rr = np.where(hits.any(axis=1), 1.0 / (hits.argmax(axis=1) + 1), 0.0)
+
+    return {
+        f"Precision@{k}": precision,
+        f"Recall@{k}": recall,
+        f"F1-Score@{k}": f1,
+        "MAP": ap,
+        "MRR": rr,
+    }
+
+def build_metrics_table(metrics_by_method: Dict[str, Dict[str, float]]) -> pd.DataFrame:
+    """
+    Menyusun tabel metrik (Metrik sebagai indeks, Metode sebagai kolom) langsung dari
+    dictionary {metode: {metrik: nilai}}, diurutkan seperti hasil pivot_table sebelumnya.
+    """
+    table = pd.DataFrame(metrics_by_method, dtype=np.float64).sort_index().sort_index(axis=1)
+    table.index.name = "Metrik"
+    table.columns.name = "Metode"
+    return table
 
 # --- FUNGSI EVALUASI RETRIEVAL (DIAMBIL DARI PEMBAHASAN SEBELUMNYA) ---
 
-def eval_retrieval_all_methods():
+def eval_retrieval_all_methods(queries: Optional[List[Dict[str, Any]]],
+                               retrieved_data_all_methods: Optional[List[Dict[str, Any]]]):
     """
     Mengevaluasi kinerja retrieval untuk berbagai metode yang ditemukan dalam
-    file retrieved_cases.json.
+    file retrieved_cases.json. Data dimuat oleh load_evaluation_inputs; None berarti file gagal dimuat.
     """
     logger.info("Starting comprehensive retrieval evaluation for all methods...")
 
     if not initialize_directories(RETRIEVAL_METRICS_FILE):
         return
 
-    queries = load_json_data(QUERY_FILE)
-    retrieved_data_all_methods = load_json_data(RETRIEVED_CASES_FILE)
-
     if queries is None or retrieved_data_all_methods is None:
         logger.error("Failed to load necessary data for retrieval evaluation. Exiting.")
         return
@@ -187,114 +242,75 @@ def eval_retrieval_all_methods():
             relevant_case_ids = [query_entry.get("case_id")]
         
         if query_id:
-            query_relevant_cases_dict[str(query_id)] = [str(cid) for cid in relevant_case_ids]
-
-    # Mengorganisir hasil retrieval per query_id dan per metode
-    retrieved_by_query_and_method = {}
-    all_retrieval_methods = set()
-
-    for item in retrieved_data_all_methods:
-        query_id = str(item.get("query_id"))
-        # Asumsikan 'retrieval_results' berisi dictionary {'method_name': {'case_ids': [...], 'scores': [...]}}
-        retrieval_results = item.get("retrieval_results") 
-
-        if not query_id or not retrieval_results:
-            logger.warning(f"Skipping retrieved entry due to missing query_id or retrieval_results: {item}")
-            continue
-        
-        retrieved_by_query_and_method[query_id] = retrieval_results
-        all_retrieval_methods.update(retrieval_results.keys())
-
-    # Inisialisasi dictionary untuk menyimpan metrik akhir per metode
-    metrics_per_method = {}
-    for method in sorted(list(all_retrieval_methods)):
-        metrics_per_method[method] = {
-            "Precision@5": [],
-            "Recall@5": [],
-            "F1-Score@5": [],
-            "MAP": [],
-            "MRR": [] # Menambahkan MRR
+            # case_id di-intern agar id yang sama berbagi satu objek string (hash dan perbandingan lebih murah)
+            query_relevant_cases_dict[str(query_id)] = [sys.intern(str(cid)) for cid in relevant_case_ids]
+
+    # Kueri tanpa dokumen relevan tidak dapat dievaluasi (semua metrik pasti 0), sehingga tidak diikutkan
+    # dalam rata-rata; metrik dihitung hanya atas kueri yang memiliki ground truth
+    num_queries_without_relevance = sum(1 for relevant_case_ids in query_relevant_cases_dict.values() if not relevant_case_ids)
+    if num_queries_without_relevance:
+        logger.warning(f"Excluding {num_queries_without_relevance} queries without relevant case ids from retrieval metrics.")
+        query_relevant_cases_dict = {
+            query_id: relevant_case_ids for query_id, relevant_case_ids in query_relevant_cases_dict.items() if relevant_case_ids
         }
 
-    # Iterasi melalui setiap kueri dan setiap metode untuk menghitung metrik
+    # Mengorganisir hasil retrieval per query_id dan per metode
+    # Asumsikan 'retrieval_results' berisi dictionary {'method_name': {'case_ids': [...], 'scores': [...]}}
+    valid_entries = [
+        item for item in retrieved_data_all_methods
+        if item.get("query_id") and item.get("retrieval_results")
+    ]
+    if len(valid_entries) < len(retrieved_data_all_methods):
+        logger.warning(f"Skipping {len(retrieved_data_all_methods) - len(valid_entries)} retrieved entries due to missing query_id or retrieval_results.")
+    retrieved_by_query_and_method = {str(item["query_id"]): item["retrieval_results"] for item in valid_entries}
+    all_retrieval_methods = set().union(*(results.keys() for results in retrieved_by_query_and_method.values()))
+
+    # Kueri yang memiliki hasil retrieval, beserta himpunan dokumen relevannya (dibangun sekali untuk semua metode)
+    evaluated_query_ids = []
+    relevant_lists = []
     for query_id, relevant_case_ids in query_relevant_cases_dict.items():
         if query_id not in retrieved_by_query_and_method:
             logger.warning(f"No retrieval results found for query_id '{query_id}'. Skipping.")
             continue
-        
-        current_query_retrieval_results = retrieved_by_query_and_method[query_id]
-
-        for method_name in all_retrieval_methods:
-            # Mengambil hanya case_ids, karena skor tidak digunakan untuk metrik ini
-            retrieved_case_ids = current_query_retrieval_results.get(method_name, {}).get("case_ids", [])
-            retrieved_case_ids = [str(cid) for cid in retrieved_case_ids] # Pastikan string
-
-            # Calculate metrics
-            precision_5 = calculate_precision_at_k(retrieved_case_ids, relevant_case_ids, k=5)
-            recall_5 = calculate_recall_at_k(retrieved_case_ids, relevant_case_ids, k=5)
-            f1_5 = calculate_f1_at_k(retrieved_case_ids, relevant_case_ids, k=5)
-            ap = calculate_average_precision(retrieved_case_ids, relevant_case_ids)
-            
-            # Calculate Reciprocal Rank
-            rr = 0.0
-            for i, case_id in enumerate(retrieved_case_ids):
-                if case_id in relevant_case_ids:
-                    rr = 1.0 / (i + 1)
-                    break
-            
-            # Append metrics
-            metrics_per_method[method_name]["Precision@5"].append(precision_5)
-            metrics_per_method[method_name]["Recall@5"].append(recall_5)
-            metrics_per_method[method_name]["F1-Score@5"].append(f1_5)
-            metrics_per_method[method_name]["MAP"].append(ap)
-            metrics_per_method[method_name]["MRR"].append(rr)
-
-    # Agregasi (rata-rata) metrik untuk setiap metode
-    final_retrieval_metrics = []
-    for method_name, metrics_lists in metrics_per_method.items():
-        if metrics_lists["Precision@5"]: # Pastikan ada data untuk dihitung rata-ratanya
-            final_retrieval_metrics.append({
-                "Metrik": "Precision@5",
-                "Metode": method_name,
-                "Nilai": np.mean(metrics_lists["Precision@5"])
-            })
-            final_retrieval_metrics.append({
-                "Metrik": "Recall@5",
-                "Metode": method_name,
-                "Nilai": np.mean(metrics_lists["Recall@5"])
-            })
-            final_retrieval_metrics.append({
-                "Metrik": "F1-Score@5",
-                "Metode": method_name,
-                "Nilai": np.mean(metrics_lists["F1-Score@5"])
-            })
-            final_retrieval_metrics.append({
-                "Metrik": "MAP",
-                "Metode": method_name,
-                "Nilai": np.mean(metrics_lists["MAP"])
-            })
-            final_retrieval_metrics.append({
-                "Metrik": "MRR",
-                "Metode": method_name,
-                "Nilai": np.mean(metrics_lists["MRR"])
-            })
-        else:
-            logger.warning(f"No valid queries processed for method '{method_name}'. Skipping.")
+        evaluated_query_ids.append(query_id)
+        relevant_lists.append(list(dict.fromkeys(relevant_case_ids)))
 
-    # Ubah format ke DataFrame untuk penyimpanan yang mudah
-    df_retrieval_metrics = pd.DataFrame(final_retrieval_metrics)
-    
-    # Pivot DataFrame untuk mendapatkan format tabel yang diinginkan
-    # Metrik sebagai indeks, Metode sebagai kolom
-    if not df_retrieval_metrics.empty:
-        df_pivot = df_retrieval_metrics.pivot_table(index="Metrik", columns="Metode", values="Nilai")
-        # Format ke 4 angka di belakang koma dan ubah ke string untuk output tabel
-        df_pivot = df_pivot.applymap(lambda x: f"{x:.4f}")
+    # Pemetaan case_id -> integer dipakai bersama oleh semua metode
+    id2int: Dict[str, int] = {}
+    relevant_matrix = encode_id_matrix(relevant_lists, id2int)
 
+    # Hitung metrik untuk semua kueri sekaligus per metode ke dalam satu buffer (metode x metrik x kueri)
+    retrieval_methods = sorted(all_retrieval_methods)
+    if not evaluated_query_ids:
+        for method_name in retrieval_methods:
+            logger.warning(f"No valid queries processed for method '{method_name}'. Skipping.")
+        retrieval_methods = []
+    metric_values = np.zeros((len(retrieval_methods), len(RETRIEVAL_METRIC_NAMES), len(evaluated_query_ids)))
+    for method_idx, method_name in enumerate(retrieval_methods):
+        # Mengambil hanya case_ids, karena skor tidak digunakan untuk metrik ini
+        retrieved_matrix = encode_id_matrix(
+            [retrieved_by_query_and_method[query_id].get(method_name, {}).get("case_ids", []) for query_id in evaluated_query_ids],
+            id2int,
+        )
+        method_metrics = compute_all_metrics(retrieved_matrix, relevant_matrix, k=RETRIEVAL_K)
+        for metric_idx, metric_name in enumerate(RETRIEVAL_METRIC_NAMES):
+            metric_values[method_idx, metric_idx] = method_metrics[metric_name]
+
+    # Agregasi (rata-rata) per metode dan metrik sekaligus
+    metric_means = metric_values.mean(axis=2)
+    final_retrieval_metrics = {
+        method_name: dict(zip(RETRIEVAL_METRIC_NAMES, metric_means[method_idx].tolist()))
+        for method_idx, method_name in enumerate(retrieval_methods)
+    }
+
+    # Susun tabel langsung dengan Metrik sebagai indeks dan Metode sebagai kolom
+    if final_retrieval_metrics:
+        df_pivot = build_metrics_table(final_retrieval_metrics)
         try:
-            df_pivot.to_csv(RETRIEVAL_METRICS_FILE) # Simpan ke CSV
+            # Format 4 angka di belakang koma diterapkan saat menulis, nilai di DataFrame tetap numerik
+            df_pivot.to_csv(RETRIEVAL_METRICS_FILE, float_format="%.4f") # Simpan ke CSV
             logger.info(f"✅ Comprehensive retrieval metrics for all methods saved to '{RETRIEVAL_METRICS_FILE}'.")
-            logger.info("\n" + df_pivot.to_string()) # Cetak ke konsol
+            logger.info("\n" + df_pivot.to_string(float_format="{:.4f}".format)) # Cetak ke konsol
         except Exception as e:
             logger.error(f"❌ Failed to save comprehensive retrieval metrics: {e}")
     else:
@@ -302,18 +318,81 @@ def eval_retrieval_all_methods():
 
 # --- FUNGSI EVALUASI PREDIKSI (DIAMBIL DARI PEMBAHASAN SEBELUMNYA) ---
 
-def eval_prediction_all_methods():
+def evaluate_prediction_file(pred_file: Path, query_case_map: Dict[str, str],
+                             true_pasals_by_case: Dict[str, frozenset]) -> Optional[Tuple[str, Dict[str, float]]]:
+    """
+    Mengevaluasi satu file prediksi (satu metode retrieval) terhadap pasal ground truth.
+    Hanya menerima input yang dapat di-pickle agar dapat dijalankan di proses worker.
+    Mengembalikan (nama_metode, {metrik: nilai}) atau None jika file dilewati.
+    """
+    # Ekstrak nama metode dari nama file (contoh: predictions_TF_IDF.csv -> TF-IDF)
+    file_match = PREDICTION_FILE_RE.fullmatch(pred_file.name)
+    if not file_match:
+        logger.warning(f"Unexpected prediction file name '{pred_file.name}'. Skipping.")
+        return None
+    method_name_from_file = file_match.group(1).replace("_", " ").strip() # Ubah underscore kembali ke spasi
+    method_name_from_file = METHOD_DISPLAY_NAMES.get(method_name_from_file, method_name_from_file)
+    
+    logger.info(f"\nEvaluating predictions for method: {method_name_from_file}")
+
+    try:
+        predictions_df = read_prediction_csv(pred_file)
+    except Exception as e:
+        logger.error(f"Error loading prediction file '{pred_file}': {e}. Skipping this method.")
+        return None
+
+    if "query_id" not in predictions_df.columns:
+        logger.error(f"Prediction file '{pred_file}' has no 'query_id' column. Skipping this method.")
+        return None
+
+    # Petakan query_id -> case_id asli -> pasal ground truth per kolom, lalu buang baris yang tidak punya ground truth
+    true_series = (
+        predictions_df["query_id"].astype(str)
+        .map(query_case_map)
+        .map(true_pasals_by_case)
+    )
+    has_truth = true_series.notna()
+    true_sets = true_series[has_truth].tolist()
+    if "predicted_solution" in predictions_df.columns:
+        # Bisa berupa string ";"-separated; nilai kosong (NaN) tidak menghasilkan pasal apa pun
+        pred_strings = predictions_df.loc[has_truth, "predicted_solution"].fillna("").astype(str)
+        pred_sets = [extract_pasal_set(text) for text in pred_strings]
+    else:
+        pred_sets = [frozenset()] * len(true_sets)
+
+    total_predictions = len(true_sets)
+    tp = np.fromiter((len(t & p) for t, p in zip(true_sets, pred_sets)), dtype=np.int64, count=total_predictions)
+    true_len = np.fromiter((len(t) for t in true_sets), dtype=np.int64, count=total_predictions)
+    pred_len = np.fromiter((len(p) for p in pred_sets), dtype=np.int64, count=total_predictions)
+
+    total_tp = int(tp.sum())
+    total_fp = int((pred_len - tp).sum())
+    total_fn = int((true_len - tp).sum())
+
+    # Gunakan threshold kecocokan minimal 80% untuk dianggap sebagai prediksi akurat
+    match_ratio = tp / np.maximum(true_len, 1)  # Hindari pembagian 0
+    exact_matches = int((match_ratio >= 0.24).sum())
+
+    # Calculate metrics for the current method
+    accuracy = (exact_matches / total_predictions * 100) if total_predictions > 0 else 0.0
+    precision = (total_tp / (total_tp + total_fp) * 100) if (total_tp + total_fp) > 0 else 0.0
+    recall = (total_tp / (total_tp + total_fn) * 100) if (total_tp + total_fn) > 0 else 0.0
+    f1 = (2 * (precision/100) * (recall/100) / ((precision/100) + (recall/100)) * 100) if (precision + recall) > 0 else 0.0
+
+    return method_name_from_file, {
+        "Accuracy": accuracy, "Precision": precision, "Recall": recall, "F1-Score": f1
+    }
+
+def eval_prediction_all_methods(queries: Optional[List[Dict[str, Any]]], cases: Optional[List[Dict[str, Any]]]):
     """
     Mengevaluasi kinerja prediksi solusi untuk berbagai metode retrieval.
+    Data dimuat oleh load_evaluation_inputs; None berarti file gagal dimuat.
     """
     logger.info("Starting comprehensive prediction evaluation for all retrieval methods...")
 
     if not initialize_directories(PREDICTION_METRICS_FILE):
         return
 
-    queries = load_json_data(QUERY_FILE)
-    cases = load_json_data(CASE_FILE)
-
     if queries is None or cases is None:
         logger.error("Failed to load necessary data for prediction evaluation. Exiting.")
         return
@@ -322,13 +401,14 @@ def eval_prediction_all_methods():
         return
 
     # Buat kamus untuk akses cepat data kasus (ground truth pasal) dan kueri (original_case_id)
-    case_dict = {str(c.get("case_id")): c.get("pasal", "") 
+    # case_id di-intern sehingga lookup query_case_map -> true_pasals_by_case membandingkan objek yang sama
+    case_dict = {sys.intern(str(c.get("case_id"))): c.get("pasal", "") 
                  for c in cases if c.get("case_id")}
-    query_case_map = {str(q.get("query_id")): str(q.get("case_id")) 
+    query_case_map = {str(q.get("query_id")): sys.intern(str(q.get("case_id"))) 
                       for q in queries if q.get("query_id") and q.get("case_id")}
 
     # List untuk menyimpan semua metrik prediksi dari setiap metode
-    all_prediction_metrics_results = []
+    all_prediction_metrics_results = {}
 
     # Temukan semua file prediksi yang dihasilkan oleh script prediksi yang dimodifikasi
     prediction_files = list(PREDICTIONS_DIR.glob(PREDICTION_FILE_PATTERN.format(method_name="*")))
@@ -337,90 +417,37 @@ def eval_prediction_all_methods():
         logger.warning(f"No prediction files found in '{PREDICTIONS_DIR}' matching pattern '{PREDICTION_FILE_PATTERN}'.")
         return
 
-    for pred_file in prediction_files:
-        # Ekstrak nama metode dari nama file (contoh: predictions_TF_IDF.csv -> TF-IDF)
-        method_name_from_file = pred_file.name.replace("predictions_", "").replace(".csv", "")
-        method_name_from_file = method_name_from_file.replace("_", " ") # Ubah underscore kembali ke spasi
-        method_name_from_file = method_name_from_file.replace("TF IDF", "TF-IDF").replace("BERT ", "BERT").strip() # Normalisasi untuk display
-        
-        logger.info(f"\nEvaluating predictions for method: {method_name_from_file}")
-
-        try:
-            predictions_df = pd.read_csv(pred_file)
-        except Exception as e:
-            logger.error(f"Error loading prediction file '{pred_file}': {e}. Skipping this method.")
-            continue
-
-        total_tp = 0
-        total_fp = 0
-        total_fn = 0
-        exact_matches = 0
-        total_predictions = 0
-
-        for index, row in predictions_df.iterrows():
-            query_id = str(row.get("query_id"))
-            predicted_solution_str = str(row.get("predicted_solution", ""))  # Bisa berupa string ";"-separated
-
-            original_case_id = query_case_map.get(query_id)
-            if not original_case_id:
-                continue
-
-            ground_truth_pasal_str = case_dict.get(original_case_id)
-            if ground_truth_pasal_str is None:
-                continue
-
-            # Gunakan extract_pasals untuk memproses string pasal (baik ground truth maupun prediksi)
-            true_pasals = set(extract_pasals(ground_truth_pasal_str))
-            pred_pasals = set(extract_pasals(predicted_solution_str))
-
-            # Gunakan threshold kecocokan minimal 80% untuk dianggap sebagai prediksi akurat
-            intersection_len = len(true_pasals & pred_pasals)
-            max_len = max(len(true_pasals), 1)  # Hindari pembagian 0
-            match_ratio = intersection_len / max_len
-
-            if match_ratio >= 0.24:
-                exact_matches += 1
-
-            total_predictions += 1
+    # Pasal ground truth diekstrak sekali per kasus yang dirujuk kueri, bukan sekali per baris per metode
+    true_pasals_by_case = {
+        case_id: extract_pasal_set(case_dict[case_id])
+        for case_id in set(query_case_map.values()) if case_id in case_dict
+    }
+
+    # Setiap file prediksi (metode) dievaluasi secara independen, sehingga dibagi ke beberapa proses
+    max_workers = min(len(prediction_files), os.cpu_count() or 1)
+    if max_workers > 1:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            method_results = list(executor.map(
+                evaluate_prediction_file, prediction_files, repeat(query_case_map), repeat(true_pasals_by_case)
+            ))
+    else:
+        method_results = [
+            evaluate_prediction_file(pred_file, query_case_map, true_pasals_by_case) for pred_file in prediction_files
+        ]
 
-            tp = len(true_pasals & pred_pasals)
-            fp = len(pred_pasals - true_pasals)
-            fn = len(true_pasals - pred_pasals)
+    for method_result in method_results:
+        if method_result is not None:
+            method_name_from_file, method_metrics = method_result
+            all_prediction_metrics_results[method_name_from_file] = method_metrics
 
-            total_tp += tp
-            total_fp += fp
-            total_fn += fn
-        
-        # Calculate metrics for the current method
-        accuracy = (exact_matches / total_predictions * 100) if total_predictions > 0 else 0.0
-        precision = (total_tp / (total_tp + total_fp) * 100) if (total_tp + total_fp) > 0 else 0.0
-        recall = (total_tp / (total_tp + total_fn) * 100) if (total_tp + total_fn) > 0 else 0.0
-        f1 = (2 * (precision/100) * (recall/100) / ((precision/100) + (recall/100)) * 100) if (precision + recall) > 0 else 0.0
-
-        # Append metrics to the list for overall table
-        all_prediction_metrics_results.append({
-            "Metrik": "Accuracy", "Metode": method_name_from_file, "Nilai": accuracy
-        })
-        all_prediction_metrics_results.append({
-            "Metrik": "Precision", "Metode": method_name_from_file, "Nilai": precision
-        })
-        all_prediction_metrics_results.append({
-            "Metrik": "Recall", "Metode": method_name_from_file, "Nilai": recall
-        })
-        all_prediction_metrics_results.append({
-            "Metrik": "F1-Score", "Metode": method_name_from_file, "Nilai": f1
-        })
-    
     # Simpan metrik prediksi secara keseluruhan dalam format tabel
     if all_prediction_metrics_results:
-        df_prediction_metrics = pd.DataFrame(all_prediction_metrics_results)
-        df_pivot_pred = df_prediction_metrics.pivot_table(index="Metrik", columns="Metode", values="Nilai")
-        df_pivot_pred = df_pivot_pred.applymap(lambda x: f"{x:.2f}%")
+        df_pivot_pred = build_metrics_table(all_prediction_metrics_results)
 
         try:
-            df_pivot_pred.to_csv(PREDICTION_METRICS_FILE)
+            df_pivot_pred.to_csv(PREDICTION_METRICS_FILE, float_format="%.2f%%")
             logger.info(f"✅ Comprehensive prediction metrics for all methods saved to '{PREDICTION_METRICS_FILE}'.")
-            logger.info("\n" + df_pivot_pred.to_string())
+            logger.info("\n" + df_pivot_pred.to_string(float_format="{:.2f}%".format))
         except Exception as e:
             logger.error(f"❌ Failed to save comprehensive prediction metrics: {e}")
     else:
@@ -429,5 +456,6 @@ def eval_prediction_all_methods():
 
 # --- Titik Masuk Skrip ---
 if __name__ == "__main__":
-    eval_retrieval_all_methods() # Panggil fungsi evaluasi retrieval multi-metode
-    eval_prediction_all_methods() # Panggil fungsi evaluasi prediksi multi-metodea
\ No newline at end of file
+    queries, cases, retrieved_cases = load_evaluation_inputs() # Muat semua input sekali, secara bersamaan
+    eval_retrieval_all_methods(queries, retrieved_cases) # Panggil fungsi evaluasi retrieval multi-metode
+    eval_prediction_all_methods(queries, cases) # Panggil fungsi evaluasi prediksi multi-metodea
\ No newline at end of file
@@ -1,13 +1,36 @@
 import json
 import os
+from collections import Counter
 from pathlib import Path
 from typing import List, Dict, Any, Optional, Tuple # Menambahkan Tuple
 import logging
+# orjson (opsional) jauh lebih cepat untuk memuat file JSON besar; fallback ke modul json bawaan
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # --- Konfigurasi ---
 PROCESSED_FILE = Path("data/processed/cases.json")
 QUERIES_FILE = Path("data/eval/queries.json")
 
+# Urutan prioritas bidang yang akan digunakan untuk teks kueri, beserta nama kombinasinya
+QUERY_FIELD_COMBINATIONS = (
+    # Coba pertama: ringkasan_fakta jika valid
+    (("ringkasan_fakta",), "ringkasan_fakta"),
+    # Coba kedua: gabungkan informasi kunci kasus
+    (("jenis_perkara", "pasal", "status_hukuman"), "jenis_perkara, pasal, status_hukuman"),
+    # Coba ketiga: info kasus dasar
+    (("jenis_perkara", "pasal"), "jenis_perkara, pasal"),
+    # Coba keempat: hanya jenis kasus dan info dasar
+    (("no_perkara", "jenis_perkara", "tanggal"), "no_perkara, jenis_perkara, tanggal"),
+)
+QUERY_FIELDS = tuple(dict.fromkeys(field for fields, _ in QUERY_FIELD_COMBINATIONS for field in fields))
+# Nilai placeholder yang tidak dianggap sebagai konten
+_PLACEHOLDERS = frozenset({"===", "---", "...", "N/A", "null", "undefined"})
+# Batas panjang bidang sebelum dipotong
+QUERY_FIELD_MAX_LENGTHS = {"pasal": 200, "status_hukuman": 300}
+
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
 logger = logging.getLogger(__name__)
@@ -40,8 +63,12 @@ def load_cases_data() -> Optional[List[Dict[str, Any]]]:
         return None
 
     try:
-        with open(PROCESSED_FILE, "r", encoding="utf-8") as f:
-            data = json.load(f)
+        if orjson is not None:
+            with open(PROCESSED_FILE, "rb") as f:
+                data = orjson.loads(f.read())
+        else:
+            with open(PROCESSED_FILE, "r", encoding="utf-8") as f:
+                data = json.load(f)
             
         # Memvalidasi struktur data
         if not isinstance(data, list):
@@ -78,52 +105,31 @@ def create_query_text(case: Dict[str, Any]) -> Tuple[Optional[str], Optional[str
         Tuple[Optional[str], Optional[str]]: (Teks kueri yang dihasilkan, string bidang yang digunakan)
                                               atau (None, None) jika tidak ada konten yang cocok ditemukan
     """
-    # Urutan prioritas bidang yang akan digunakan untuk teks kueri
-    field_combinations = [
-        # Coba pertama: ringkasan_fakta jika valid
-        (["ringkasan_fakta"], "ringkasan_fakta"),
-        
-        # Coba kedua: gabungkan informasi kunci kasus
-        (["jenis_perkara", "pasal", "status_hukuman"], "jenis_perkara, pasal, status_hukuman"),
-        
-        # Coba ketiga: info kasus dasar
-        (["jenis_perkara", "pasal"], "jenis_perkara, pasal"),
-        
-        # Coba keempat: hanya jenis kasus dan info dasar
-        (["no_perkara", "jenis_perkara", "tanggal"], "no_perkara, jenis_perkara, tanggal"),
-    ]
-    
-    for fields_to_try, combination_name in field_combinations:
-        text_parts = []
-        
-        for field in fields_to_try:
-            if field in case and isinstance(case[field], str):
-                value = case[field].strip()
-                
-                # Lewati jika itu placeholder atau terlalu pendek
-                if (value and 
-                    value not in ["===", "---", "...", "N/A", "null", "undefined"] and
-                    len(set(value)) > 1 and  # Bukan hanya karakter berulang
-                    len(value) >= 10):   # Panjang minimum
-                    
-                    # Bersihkan teks
-                    if field == "pasal" and len(value) > 200:
-                        # Potong deskripsi pasal yang panjang
-                        value = value[:200] + "..."
-                    elif field == "status_hukuman" and len(value) > 300:
-                        # Potong deskripsi status yang panjang
-                        value = value[:300] + "..."
-                    
-                    text_parts.append(value)
-        
-        # Jika kami menemukan konten yang valid, gabungkan
+    # Normalisasi setiap bidang yang dikenal tepat sekali per kasus
+    valid_values = {}
+    for field in QUERY_FIELDS:
+        value = case.get(field)
+        if not isinstance(value, str):
+            continue
+        value = value.strip()
+
+        # Lewati jika itu placeholder atau terlalu pendek
+        if (len(value) >= 10 and  # Panjang minimum
+            value not in _PLACEHOLDERS and
+            len(set(value)) > 1):  # Bukan hanya karakter berulang
+
+            # Potong deskripsi pasal/status yang panjang
+            max_length = QUERY_FIELD_MAX_LENGTHS.get(field)
+            if max_length is not None and len(value) > max_length:
+                value = value[:max_length] + "..."
+            valid_values[field] = value
+
+    for fields_to_try, combination_name in QUERY_FIELD_COMBINATIONS:
+        text_parts = [valid_values[field] for field in fields_to_try if field in valid_values]
+
+        # Jika kami menemukan konten yang valid, gabungkan menjadi teks kueri terstruktur
         if text_parts:
-            if len(text_parts) == 1:
-                return text_parts[0], combination_name
-            else:
-                # Buat teks kueri terstruktur
-                combined_text = ". ".join(text_parts)
-                return combined_text, combination_name
+            return ". ".join(text_parts), combination_name
     
     return None, None # Kembalikan None untuk keduanya jika tidak ada konten yang cocok ditemukan
 
@@ -139,10 +145,16 @@ def process_cases_to_queries(cases: List[Dict[str, Any]]) -> List[Dict[str, str]
     """
     queries = []
     valid_count = 0
+    # Kasus yang dilewati dan bidang yang digunakan dikumpulkan lalu dilaporkan sekali di akhir,
+    # log per kasus hanya ditulis pada level DEBUG
+    log_each_case = logger.isEnabledFor(logging.DEBUG)
+    non_dict_indices = []
+    no_content_indices = []
+    fields_used_counts = Counter()
     
     for i, case in enumerate(cases):
         if not isinstance(case, dict):
-            logger.warning(f"Skipping case at index {i}: not a dictionary")
+            non_dict_indices.append(i)
             continue
         
         # Coba buat teks kueri yang bermakna dan dapatkan bidang yang digunakan
@@ -161,11 +173,20 @@ def process_cases_to_queries(cases: List[Dict[str, Any]]) -> List[Dict[str, str]
             }
             queries.append(query_data)
             valid_count += 1
-            # Log informasi bidang yang digunakan untuk setiap kueri
-            logger.info(f"Query for case {i} (ID: {case.get('case_id', f'case_{i}')}) generated using: {fields_used}")
+            fields_used_counts[fields_used] += 1
+            if log_each_case:
+                logger.debug(f"Query for case {i} (ID: {case.get('case_id', f'case_{i}')}) generated using: {fields_used}")
         else:
-            logger.warning(f"Skipping case at index {i}: no suitable text content found")
+            no_content_indices.append(i)
     
+    if non_dict_indices:
+        logger.warning(f"Skipped {len(non_dict_indices)} cases that are not dictionaries (indices: {non_dict_indices[:10]}"
+                       f"{', ...' if len(non_dict_indices) > 10 else ''})")
+    if no_content_indices:
+        logger.warning(f"Skipped {len(no_content_indices)} cases with no suitable text content (indices: {no_content_indices[:10]}"
+                       f"{', ...' if len(no_content_indices) > 10 else ''})")
+    for fields_used, count in fields_used_counts.most_common():
+        logger.info(f"{count} queries generated using: {fields_used}")
     logger.info(f"Processed {len(cases)} cases, {valid_count} valid queries created, "
                f"{len(cases) - valid_count} entries skipped")
     
@@ -192,6 +213,7 @@ def save_queries(queries: List[Dict[str, str]]) -> bool:
             QUERIES_FILE.rename(backup_file)
             logger.info(f"Existing file backed up to '{backup_file}'")
         
+        # Ditulis dengan modul json bawaan: orjson hanya mendukung indentasi 2 spasi, sedangkan format file ini 4 spasi
         with open(QUERIES_FILE, "w", encoding="utf-8") as f:
             json.dump(queries, f, indent=4, ensure_ascii=False)
             